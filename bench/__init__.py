@@ -0,0 +1 @@
+# Offline benchmarks: synthetic inboxes, local article stub, per-stage timings
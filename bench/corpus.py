@@ -0,0 +1,219 @@
+"""
+Synthetic newsletter inbox for benchmarks, plus a Gmail client stand-in exposing the
+same interface as src.gmail.client.build_client().
+"""
+
+import base64
+import random
+import re
+import time
+from datetime import datetime
+
+from src.gmail.client import get_body_from_message, get_headers_from_message, TRIAGE_HEADERS
+
+NEWSLETTER_SENDERS = (
+    "Platformer <casey@platformer.news>",
+    "Stratechery <email@stratechery.com>",
+    "The Download <newsletters@technologyreview.com>",
+    "Money Stuff <noreply@mail.bloombergbusiness.com>",
+    "Import AI <importai@substack.com>",
+    "Morning Brew <crew@morningbrew.com>",
+    "Axios Pro Rata <newsletter@axios.com>",
+    "Benedict's Newsletter <list@ben-evans.com>",
+    "TLDR Daily <dan@tldrnewsletter.com>",
+    "Weekly Robotics <hello@weeklyrobotics.beehiiv.com>",
+)
+OTHER_SENDERS = (
+    "Google <no-reply@accounts.google.com>",
+    "Alice Smith <alice@example.org>",
+    "GitHub <notifications@github.com>",
+    "Amazon.com <shipment-tracking@amazon.com>",
+)
+OTHER_SUBJECTS = (
+    "Security alert",
+    "Lunch on Thursday?",
+    "Your order has shipped",
+    "[repo] New pull request",
+)
+WORDS = (
+    "model market policy research startup chip climate election funding regulation "
+    "platform software hardware investors growth energy health study data cloud court "
+    "inflation rates launch users network privacy security open source agents robots "
+    "battery supply chain tariffs earnings revenue analysts vaccine trial campus media"
+).split()
+
+
+def _sentence(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def story_title(story: int) -> str:
+    rng = random.Random(story)
+    return _sentence(rng, rng.randint(6, 12)).rstrip(".")
+
+
+def _newsletter_html(rng: random.Random, issue: int, article_urls: list[str], paragraphs: int) -> str:
+    blocks = []
+    for i in range(paragraphs):
+        text = " ".join(_sentence(rng, rng.randint(8, 20)) for _ in range(rng.randint(2, 5)))
+        if i < len(article_urls):
+            text += f' <a href="{article_urls[i]}?utm_source=newsletter&utm_medium=email">Read more</a>'
+        blocks.append(f"<tr><td style=\"padding:8px 0;font-family:Georgia,serif\"><p>{text}</p></td></tr>")
+    for url in article_urls[paragraphs:]:
+        blocks.append(f'<tr><td><p>Also: <a href="{url}">{_sentence(rng, 5)}</a></p></td></tr>')
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\"><title>Issue "
+        f"{issue}</title><style>td{{color:#222}} a{{color:#06c}}</style></head><body>"
+        f"<div class=\"content\"><table width=\"100%\">{''.join(blocks)}</table></div>"
+        "<footer><p>You are receiving this because you subscribed. "
+        '<a href="https://example.com/unsubscribe">Unsubscribe</a> · '
+        '<a href="https://twitter.com/example">Twitter</a></p></footer></body></html>'
+    )
+
+
+def _encode(html: str) -> str:
+    return base64.urlsafe_b64encode(html.encode("utf-8")).decode("ascii")
+
+
+def generate_corpus(
+    n_messages: int,
+    article_base_urls: list[str],
+    newsletter_ratio: float = 0.6,
+    stories: int | None = None,
+    seed: int = 0,
+    days: float = 7.0,
+) -> dict[str, dict]:
+    """
+    Build n_messages Gmail-API-shaped message dicts (format="full"), keyed by id, received
+    newest first and spread evenly over the last `days` days.
+    Newsletters vary in size (2-40 paragraphs) and link count (3-60), and link into a
+    shared pool of stories spread across article_base_urls, so popular stories recur.
+    """
+    rng = random.Random(seed)
+    stories = stories or max(20, n_messages // 2)
+    now_ms = int(time.time() * 1000)
+    spacing_ms = days * 86_400_000 / max(1, n_messages)
+    messages = {}
+    for i in range(n_messages):
+        mid = f"{i:016x}"
+        if rng.random() < newsletter_ratio:
+            sender = rng.choice(NEWSLETTER_SENDERS)
+            subject = f"Issue #{i}: {story_title(rng.randrange(stories))}"
+            # Skewed story choice: low ids are "popular" and cited by many newsletters
+            picks = {int(rng.paretovariate(1.2) * 3) % stories for _ in range(rng.randint(3, 60))}
+            urls = [f"{article_base_urls[s % len(article_base_urls)]}/article/{s}" for s in sorted(picks)]
+            html = _newsletter_html(rng, i, urls, rng.randint(2, 40))
+            extra = [
+                {"name": "List-Id", "value": f"<list{i % 10}.example.com>"},
+                {"name": "List-Unsubscribe", "value": "<https://example.com/unsubscribe>"},
+            ]
+        else:
+            sender = rng.choice(OTHER_SENDERS)
+            subject = rng.choice(OTHER_SUBJECTS)
+            html = f"<html><body><p>{_sentence(rng, 30)}</p></body></html>"
+            extra = []
+        messages[mid] = {
+            "id": mid,
+            "threadId": mid,
+            "labelIds": ["INBOX", "UNREAD"],
+            "internalDate": str(now_ms - int(i * spacing_ms)),
+            "payload": {
+                "mimeType": "text/html",
+                "headers": [{"name": "From", "value": sender}, {"name": "Subject", "value": subject}] + extra,
+                "body": {"data": _encode(html)},
+            },
+        }
+    return messages
+
+
+def _in_window(msg: dict, query: str) -> bool:
+    """Whether msg matches the after:/before: dates of query (local midnight; other terms ignored)."""
+    received = int(msg.get("internalDate") or 0) / 1000
+    for op, value in re.findall(r"\b(after|before):(\d{4}/\d{2}/\d{2})", query):
+        bound = datetime.strptime(value, "%Y/%m/%d").timestamp()
+        if (op == "after" and received < bound) or (op == "before" and received >= bound):
+            return False
+    return True
+
+
+class SyntheticGmailClient:
+    """
+    Stand-in for build_client() serving a synthetic corpus.
+    round_trip_ms simulates one Gmail HTTP round trip (per list page, batch or call).
+    History ids count messages in arrival order (the corpus is newest first), so the
+    mailbox's current id is the corpus size and nothing is added after it.
+    """
+
+    def __init__(self, messages: dict[str, dict], round_trip_ms: float = 0.0, page_size: int = 500, batch_size: int = 100):
+        self.messages = messages
+        self.round_trip = round_trip_ms / 1000
+        self.page_size = page_size
+        self.batch_size = batch_size
+        self.requests = 0
+        self.sent: list[tuple[str, str, str]] = []
+        self.service = None
+
+    def _rtt(self) -> None:
+        self.requests += 1
+        if self.round_trip:
+            time.sleep(self.round_trip)
+
+    def list_message_ids(self, query: str, max_results: int = 500):
+        ids = [mid for mid in self.messages if _in_window(self.messages[mid], query)]
+        for start in range(0, len(ids), self.page_size):
+            self._rtt()
+            yield from ids[start:start + self.page_size]
+
+    def get_history_id(self) -> str:
+        self._rtt()
+        return str(len(self.messages))
+
+    def list_history_message_ids(self, start_history_id: str):
+        ids = list(self.messages)
+        # Message i (newest first) was added at history id len(ids) - i
+        added = ids[:max(0, len(ids) - int(start_history_id))]
+        self._rtt()
+        for start in range(0, len(added), self.page_size):
+            if start:
+                self._rtt()
+            yield from added[start:start + self.page_size]
+
+    def get_message(self, message_id: str) -> dict:
+        self._rtt()
+        return self.messages[message_id]
+
+    def get_messages(self, ids, format: str = "full"):
+        ids = list(ids)
+        for start in range(0, len(ids), self.batch_size):
+            self._rtt()
+            for mid in ids[start:start + self.batch_size]:
+                yield self._metadata(mid) if format == "metadata" else self.messages[mid]
+
+    def get_message_metadata(self, ids):
+        return self.get_messages(ids, format="metadata")
+
+    def _metadata(self, mid: str) -> dict:
+        msg = self.messages[mid]
+        wanted = {h.lower() for h in TRIAGE_HEADERS}
+        headers = [h for h in msg["payload"]["headers"] if h["name"].lower() in wanted]
+        return {"id": mid, "threadId": msg["threadId"], "payload": {"headers": headers}}
+
+    get_body = staticmethod(get_body_from_message)
+    get_headers = staticmethod(get_headers_from_message)
+
+    def mark_as_read(self, mid: str) -> None:
+        self._rtt()
+
+    def batch_modify(self, ids, add=None, remove=None) -> list[str]:
+        ids = list(ids)
+        for _ in range(0, len(ids), 1000):
+            self._rtt()
+        return []
+
+    def mark_many_as_read(self, ids) -> list[str]:
+        return self.batch_modify(ids, remove=["UNREAD"])
+
+    def send_email(self, to: str, subject: str, body: str) -> dict:
+        self._rtt()
+        self.sent.append((to, subject, body))
+        return {"id": "sent"}
@@ -0,0 +1,94 @@
+"""
+Local HTTP server serving synthetic article pages with configurable latency and errors.
+Listens on all of 127.0.0.0/8 so distinct 127.0.0.x addresses act as distinct hosts.
+"""
+
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bench.corpus import WORDS, story_title
+
+
+def article_html(story: int, paragraphs: int = 12) -> str:
+    rng = random.Random(story)
+    body = "".join(
+        "<p>" + " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 90))) + ".</p>"
+        for _ in range(paragraphs)
+    )
+    return (
+        f"<!DOCTYPE html><html><head><title>{story_title(story)}</title></head><body>"
+        "<nav><a href=\"/\">Home</a> <a href=\"/about\">About</a></nav>"
+        f"<article><h1>{story_title(story)}</h1>{body}</article>"
+        "<aside>Related: more stories</aside><footer>© Example</footer></body></html>"
+    )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "ArticleStub/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        stub: "ArticleStub" = self.server.stub
+        stub.count()
+        delay = stub.latency_ms + random.uniform(0, stub.jitter_ms)
+        if delay:
+            time.sleep(delay / 1000)
+        roll = random.random()
+        if roll < stub.error_rate:
+            self._send(random.choice((404, 500, 503)), "text/plain", b"error")
+            return
+        if roll < stub.error_rate + stub.non_html_rate:
+            self._send(200, "application/pdf", b"%PDF-1.4\n" + b"0" * 4096)
+            return
+        try:
+            story = int(self.path.split("?")[0].rstrip("/").rsplit("/", 1)[-1])
+        except ValueError:
+            story = 0
+        self._send(200, "text/html; charset=utf-8", article_html(story).encode("utf-8"))
+
+    def _send(self, status: int, content_type: str, body: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ArticleStub:
+    """
+    Context manager running the stub in a background thread.
+    base_urls(n) returns n URL prefixes on distinct loopback hosts.
+    """
+
+    def __init__(self, latency_ms: float = 50.0, jitter_ms: float = 50.0, error_rate: float = 0.05, non_html_rate: float = 0.02):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.non_html_rate = non_html_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("0.0.0.0", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def base_urls(self, hosts: int) -> list[str]:
+        return [f"http://127.0.0.{h + 1}:{self.port}" for h in range(hosts)]
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
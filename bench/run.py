@@ -0,0 +1,136 @@
+"""
+Offline pipeline benchmark: synthetic inbox + local article stub, no Gmail or open web.
+
+    python -m bench.run --scale 1k
+    python -m bench.run --messages 250 --latency-ms 100 --error-rate 0.1
+    python -m bench.run --compare bench/results/a.json bench/results/b.json
+
+The synthetic inbox stands in for build_client() and the real pipeline (src.run.run) runs
+on it, so the code timed is the code that ships. Stage timings, counters and fetch latency
+come from its metrics run report and are written as JSON under bench/results/ so runs can
+be compared between commits. Per-host rate limits come from FETCH_HOST_RATE and
+FETCH_HOST_BURST, as in a real run.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import config
+from bench.corpus import SyntheticGmailClient, generate_corpus
+from bench.http_stub import ArticleStub
+from src.run import run
+
+SCALES = {"100": 100, "1k": 1000, "10k": 10000}
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def run_benchmark(args) -> dict:
+    """
+    Run src.run.run() on a synthetic inbox against the article stub, with state, article
+    cache, redirect map and output in a temporary directory (so every run fetches for
+    real), and return its metrics run report with the benchmark parameters.
+    """
+    clients: list[SyntheticGmailClient] = []
+    with ArticleStub(args.latency_ms, args.jitter_ms, args.error_rate, args.non_html_rate) as stub, \
+            tempfile.TemporaryDirectory(prefix="bench-") as tmp:
+        corpus = generate_corpus(args.messages, stub.base_urls(args.hosts), seed=args.seed)
+
+        def client_factory() -> SyntheticGmailClient:
+            client = SyntheticGmailClient(corpus, round_trip_ms=args.gmail_rtt_ms)
+            clients.append(client)
+            return client
+
+        work = Path(tmp)
+        config.STATE_DB_PATH = work / "state.sqlite3"
+        config.ARTICLE_CACHE_PATH = work / "article-cache.sqlite3"
+        config.URL_MAP_PATH = work / "url-map.sqlite3"
+        config.OUTPUT_DIR = work / "output"
+        config.MAX_LINKS_PER_RUN = args.max_links
+        config.FETCH_CONCURRENCY = args.concurrency
+        config.DIGEST_RECIPIENT = "bench@example.com"
+        # Benchmark reports are not forwarded to monitoring
+        config.METRICS_HOOK = ""
+        run(send=True, mark_read=True, full_sync=True, io_mode="", client_factory=client_factory)
+        report = json.loads(next(config.OUTPUT_DIR.glob("*.json")).read_text(encoding="utf-8"))
+        stub_requests = stub.requests
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "params": {
+            **{k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+            "host_rate": config.FETCH_HOST_RATE,
+            "host_burst": config.FETCH_HOST_BURST,
+        },
+        "counts": {
+            **report["counters"],
+            "gmail_requests": sum(c.requests for c in clients),
+            "stub_requests": stub_requests,
+        },
+        "stages": report["stages"],
+        "histograms": report["histograms"],
+        "total_wall_s": report["duration_s"],
+    }
+
+
+def _git_commit() -> str:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(a_path: str, b_path: str) -> None:
+    """Print per-stage wall time of b relative to a."""
+    a = json.loads(Path(a_path).read_text())
+    b = json.loads(Path(b_path).read_text())
+    print(f"{'stage':<14} {a.get('commit') or 'a':>10} {b.get('commit') or 'b':>10}   change")
+    for name in list(a["stages"]) + [n for n in b["stages"] if n not in a["stages"]]:
+        wa = a["stages"].get(name, {}).get("wall_s")
+        wb = b["stages"].get(name, {}).get("wall_s")
+        change = f"{(wb - wa) / wa * 100:+.1f}%" if wa and wb is not None else "n/a"
+        print(f"{name:<14} {wa if wa is not None else '-':>10} {wb if wb is not None else '-':>10}   {change}")
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Offline pipeline benchmark")
+    p.add_argument("--scale", choices=sorted(SCALES), default="100", help="Corpus size preset")
+    p.add_argument("--messages", type=int, default=None, help="Corpus size (overrides --scale)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--hosts", type=int, default=20, help="Distinct article hosts")
+    p.add_argument("--max-links", type=int, default=200, help="Links fetched (like MAX_LINKS_PER_RUN)")
+    p.add_argument("--concurrency", type=int, default=config.FETCH_CONCURRENCY)
+    p.add_argument("--latency-ms", type=float, default=50.0, help="Article stub base latency")
+    p.add_argument("--jitter-ms", type=float, default=50.0, help="Article stub random extra latency")
+    p.add_argument("--error-rate", type=float, default=0.05, help="Fraction of article requests failing")
+    p.add_argument("--non-html-rate", type=float, default=0.02, help="Fraction of articles served as PDF")
+    p.add_argument("--gmail-rtt-ms", type=float, default=0.0, help="Simulated Gmail round trip")
+    p.add_argument("--out", default=None, help="Result JSON path (default bench/results/<time>-<commit>.json)")
+    p.add_argument("--compare", nargs=2, metavar=("A", "B"), help="Compare two result files and exit")
+    args = p.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.messages is None:
+        args.messages = SCALES[args.scale]
+
+    report = run_benchmark(args)
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{report['commit'] or 'nogit'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+    for name, s in report["stages"].items():
+        print(f"{name:<14} {s['wall_s']:>8.3f}s wall  {s['cpu_s']:>8.3f}s cpu  {s['calls']:>6} calls")
+    print(f"{'total':<14} {report['total_wall_s']:>8.3f}s")
+    print(f"Wrote {out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -21,10 +21,90 @@ GMAIL_CLIENT_SECRET = os.environ.get("GMAIL_CLIENT_SECRET", "")
 GMAIL_REFRESH_TOKEN = os.environ.get("GMAIL_REFRESH_TOKEN", "")
 GMAIL_CREDENTIALS_PATH = os.environ.get("GMAIL_CREDENTIALS_PATH", str(PROJECT_ROOT / "credentials.json"))
 GMAIL_TOKEN_PATH = os.environ.get("GMAIL_TOKEN_PATH", str(PROJECT_ROOT / "token.json"))
+# Access token minted from the refresh token, cached with its expiry between runs ("" disables)
+GMAIL_ACCESS_TOKEN_CACHE = os.environ.get("GMAIL_ACCESS_TOKEN_CACHE", str(DATA_DIR / "gmail-access-token.json"))
 
 # Content limits
 MAX_LINKS_PER_RUN = int(os.environ.get("MAX_LINKS_PER_RUN", "25"))
 MIN_WORD_COUNT = int(os.environ.get("MIN_WORD_COUNT", "80"))
+# Links are fetched best first (see src.pipeline.schedule); fetches not finished this many
+# seconds after fetching starts are dropped (0 = no limit). Links already in a digest from
+# the last DIGESTED_URL_DAYS days rank last.
+FETCH_TIME_BUDGET_S = float(os.environ.get("FETCH_TIME_BUDGET_S", "180"))
+DIGESTED_URL_DAYS = float(os.environ.get("DIGESTED_URL_DAYS", "14"))
+
+# Article fetching: global concurrency and per-host politeness (token bucket)
+FETCH_CONCURRENCY = int(os.environ.get("FETCH_CONCURRENCY", "8"))
+FETCH_HOST_RATE = float(os.environ.get("FETCH_HOST_RATE", "2.0"))  # requests/sec per host
+FETCH_HOST_BURST = int(os.environ.get("FETCH_HOST_BURST", "1"))
+# Shared HTTP session: idle keep-alive connections per host, and retries of 429/5xx/connection
+# errors (per request, and per run with a deadline so retries can't stretch the run)
+FETCH_POOL_HOSTS = int(os.environ.get("FETCH_POOL_HOSTS", "32"))
+FETCH_POOL_SIZE = int(os.environ.get("FETCH_POOL_SIZE", os.environ.get("FETCH_CONCURRENCY", "8")))
+FETCH_MAX_RETRIES = int(os.environ.get("FETCH_MAX_RETRIES", "3"))
+FETCH_RETRY_BUDGET = int(os.environ.get("FETCH_RETRY_BUDGET", "50"))
+FETCH_RETRY_DEADLINE_S = float(os.environ.get("FETCH_RETRY_DEADLINE_S", "300"))
+FETCH_MAX_BYTES = int(os.environ.get("FETCH_MAX_BYTES", str(2 * 1024 * 1024)))  # per page; the rest is not downloaded
+
+# On-disk cache of extracted articles: served without a request while younger than the TTL,
+# revalidated with conditional GETs after; LRU-evicted beyond max entries (0 disables)
+ARTICLE_CACHE_PATH = Path(os.environ.get("ARTICLE_CACHE_PATH", str(DATA_DIR / "article-cache.sqlite3")))
+ARTICLE_CACHE_TTL_HOURS = float(os.environ.get("ARTICLE_CACHE_TTL_HOURS", "24"))
+ARTICLE_CACHE_MAX_ENTRIES = int(os.environ.get("ARTICLE_CACHE_MAX_ENTRIES", "5000"))
+
+# Persistent map of click-tracking/redirect URLs to canonical article URLs
+URL_MAP_PATH = Path(os.environ.get("URL_MAP_PATH", str(DATA_DIR / "url-map.sqlite3")))
+URL_MAP_MAX_ENTRIES = int(os.environ.get("URL_MAP_MAX_ENTRIES", "50000"))
+
+# List only mail added since the last run (Gmail History API); falls back to a full sync
+GMAIL_INCREMENTAL_SYNC = os.environ.get("GMAIL_INCREMENTAL_SYNC", "1").lower() not in ("0", "false", "no")
+
+# Triage: block a sender after this many messages failed the body checks with none passing
+# (0 disables); verdicts expire after SENDER_VERDICT_DAYS so the sender is retried
+SENDER_REJECT_AFTER = int(os.environ.get("SENDER_REJECT_AFTER", "3"))
+SENDER_VERDICT_DAYS = float(os.environ.get("SENDER_VERDICT_DAYS", "30"))
+
+# Gmail API quota units per second shared by every client in the process (Gmail's per-user
+# limit is 250; 0 = no pacing)
+GMAIL_QUOTA_UNITS_PER_S = float(os.environ.get("GMAIL_QUOTA_UNITS_PER_S", "250"))
+
+# Backfills (--backfill N) longer than BACKFILL_SHARD_DAYS are split into date shards
+# (after:/before: queries) listed and downloaded by up to BACKFILL_WORKERS threads (0 = no sharding)
+BACKFILL_SHARD_DAYS = int(os.environ.get("BACKFILL_SHARD_DAYS", "7"))
+BACKFILL_WORKERS = int(os.environ.get("BACKFILL_WORKERS", "4"))
+
+# Streaming pipeline: ids per Gmail triage/download chunk, messages buffered between stages
+GMAIL_CHUNK_SIZE = int(os.environ.get("GMAIL_CHUNK_SIZE", "100"))
+PIPELINE_BUFFER = int(os.environ.get("PIPELINE_BUFFER", "32"))
+
+# HTML extraction process pool: workers (0 = CPU count, 1 = in-process), newsletters per
+# task, and documents handled in-process before the pool is started (small runs stay serial)
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", "0"))
+EXTRACT_CHUNK_SIZE = int(os.environ.get("EXTRACT_CHUNK_SIZE", "8"))
+EXTRACT_SERIAL_THRESHOLD = int(os.environ.get("EXTRACT_SERIAL_THRESHOLD", "20"))
+
+# Digest rendering: bytes per email (Gmail clips messages over ~102 KB; 0 = no limit) and
+# per-element inline styles instead of a head <style> block
+DIGEST_MAX_BYTES = int(os.environ.get("DIGEST_MAX_BYTES", "100000"))
+DIGEST_INLINE_STYLES = os.environ.get("DIGEST_INLINE_STYLES", "0").lower() not in ("0", "false", "no")
+
+# Near-duplicate detection: Jaccard similarity of title+snippet shingles to merge stories
+DEDUP_SIMILARITY = float(os.environ.get("DEDUP_SIMILARITY", "0.6"))
+
+# Categorization: minimum TF-IDF cosine score for a category; below it items go to "Other"
+CATEGORY_MIN_SCORE = float(os.environ.get("CATEGORY_MIN_SCORE", "0.02"))
+
+# Run checkpoints (SQLite) used by --resume
+STATE_DB_PATH = Path(os.environ.get("STATE_DB_PATH", str(DATA_DIR / "state.sqlite3")))
+
+# Record/replay of Gmail and HTTP I/O (src.replay): "" (live), "record" or "replay";
+# replayed calls sleep for their recorded latency times REPLAY_LATENCY_SCALE (0 = none)
+IO_MODE = os.environ.get("IO_MODE", "")
+IO_ARCHIVE_PATH = Path(os.environ.get("IO_ARCHIVE_PATH", str(DATA_DIR / "io-archive.sqlite3")))
+REPLAY_LATENCY_SCALE = float(os.environ.get("REPLAY_LATENCY_SCALE", "0"))
+
+# Optional "module:function" called with the JSON run report (e.g. to forward to monitoring)
+METRICS_HOOK = os.environ.get("METRICS_HOOK", "")
 
 # MECE categories file (inferred by bootstrap or committed)
 MECE_CATEGORIES_PATH = DATA_DIR / "mece-categories.json"
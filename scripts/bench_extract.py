@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Benchmark newsletter/article HTML extraction: legacy double html.parser pass vs single-parse API.
+Usage: python scripts/bench_extract.py [saved-newsletter.html ...]
+With no files, a synthetic newsletter-shaped document is used.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
+
+from src.extractors import newsletter
+from src.fetcher.article import extract_article
+
+
+def _synthetic(n_links: int = 60) -> str:
+    rows = "".join(
+        f'<tr><td><p>Story {i}: some commentary about the linked piece. '
+        f'<a href="https://example{i % 7}.com/post/{i}?utm_source=nl">Read more</a></p></td></tr>'
+        for i in range(n_links)
+    )
+    return (
+        "<html><head><title>Weekly Issue</title><style>td{padding:4px}</style></head>"
+        f"<body><div class=\"content\"><table>{rows}</table></div>"
+        '<footer><a href="https://example.com/unsubscribe">Unsubscribe</a></footer></body></html>'
+    )
+
+
+def _legacy(html: str) -> None:
+    # Pre-unification: extract_body and extract_links each parsed with html.parser
+    backend = newsletter.HTML_PARSER
+    newsletter.HTML_PARSER = "html.parser"
+    try:
+        newsletter.extract_body(html)
+        newsletter.extract_links(html)
+    finally:
+        newsletter.HTML_PARSER = backend
+
+
+def _time(fn, html: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(html)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    docs = [(p, Path(p).read_text(encoding="utf-8", errors="replace")) for p in sys.argv[1:]]
+    if not docs:
+        docs = [("synthetic", _synthetic())]
+    repeat = 20
+    print(f"parser backend: {newsletter.HTML_PARSER}")
+    for name, html in docs:
+        legacy_ms = _time(_legacy, html, repeat)
+        single_ms = _time(newsletter.extract_newsletter, html, repeat)
+        article_ms = _time(lambda h: extract_article(h, "https://example.com/"), html, repeat)
+        print(
+            f"{name}: {len(html) // 1024} KB  legacy {legacy_ms:.2f} ms  "
+            f"single-parse {single_ms:.2f} ms  ({legacy_ms / single_ms:.1f}x)  "
+            f"article {article_ms:.2f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
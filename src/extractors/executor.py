@@ -0,0 +1,131 @@
+"""
+Extraction executor: runs CPU-bound HTML extraction (BeautifulSoup, readability) in a
+process pool so parsing scales with cores instead of contending for the GIL.
+Newsletters are submitted in chunks to keep per-task pickling overhead small; results
+come back in submission order. Small runs (and EXTRACT_WORKERS=1) stay in-process.
+"""
+
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Iterator
+
+import config
+from src import metrics
+from src.extractors.newsletter import extract_newsletter
+
+
+def _newsletter_chunk(htmls: list[str]) -> list[dict]:
+    return [extract_newsletter(h) for h in htmls]
+
+
+def _article(html: str, url: str) -> dict:
+    from src.fetcher.article import extract_article
+    extracted = extract_article(html, url)
+    # Only the snippet is used; don't pickle the full text back to the parent
+    extracted.pop("text", None)
+    return extracted
+
+
+def default_workers() -> int:
+    return config.EXTRACT_WORKERS or (os.cpu_count() or 1)
+
+
+class ExtractionExecutor:
+    """
+    submit_newsletter() buffers (key, html) pairs into chunks of chunk_size; completed()
+    yields (key, extraction) in submission order. extract_article() may be called from
+    fetch threads. The process pool starts only after serial_threshold documents, so
+    small runs never pay for worker start-up.
+    """
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        chunk_size: int | None = None,
+        serial_threshold: int | None = None,
+    ):
+        self.workers = max(1, workers or default_workers())
+        self.chunk_size = max(1, chunk_size or config.EXTRACT_CHUNK_SIZE)
+        self.serial_threshold = config.EXTRACT_SERIAL_THRESHOLD if serial_threshold is None else serial_threshold
+        self._pool: ProcessPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._seen = 0
+        self._buffer_keys: list[Any] = []
+        self._buffer_html: list[str] = []
+        # (keys, Future | list of results) per chunk, in submission order
+        self._chunks: deque = deque()
+
+    def _use_pool(self, docs: int = 1) -> bool:
+        """Count docs; True once the pool should take them (starting the pool if needed)."""
+        with self._lock:
+            self._seen += docs
+            if self.workers <= 1 or self._seen <= self.serial_threshold:
+                return False
+            if self._pool is None:
+                # forkserver/spawn: forking a process that already runs fetch/Gmail threads is unsafe
+                methods = multiprocessing.get_all_start_methods()
+                ctx = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+                metrics.incr("extract.pool_workers", self.workers)
+            return True
+
+    def submit_newsletter(self, key: Any, html: str) -> None:
+        self._buffer_keys.append(key)
+        self._buffer_html.append(html)
+        if len(self._buffer_html) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffer_html:
+            return
+        keys, htmls = self._buffer_keys, self._buffer_html
+        self._buffer_keys, self._buffer_html = [], []
+        if self._use_pool(len(htmls)):
+            # Bound in-flight chunks so a fast producer can't pile up raw HTML in memory
+            running = [r for _, r in self._chunks if isinstance(r, Future) and not r.done()]
+            if len(running) >= 2 * self.workers:
+                with metrics.stage("extract_wait"):
+                    running[0].result()
+            self._chunks.append((keys, self._pool.submit(_newsletter_chunk, htmls)))
+            metrics.incr("extract.pool_chunks")
+        else:
+            with metrics.stage("extract"):
+                self._chunks.append((keys, _newsletter_chunk(htmls)))
+
+    def completed(self, block: bool = False) -> Iterator[tuple[Any, dict]]:
+        """
+        Yield (key, extraction) for finished chunks in submission order.
+        With block=True, flush the partial chunk and wait for everything outstanding.
+        """
+        if block:
+            self._flush()
+        while self._chunks:
+            keys, results = self._chunks[0]
+            if isinstance(results, Future):
+                if not block and not results.done():
+                    return
+                with metrics.stage("extract_wait"):
+                    results = results.result()
+            self._chunks.popleft()
+            yield from zip(keys, results)
+
+    def extract_article(self, html: str, url: str) -> dict:
+        """Extract one fetched article; blocks the calling (fetch) thread, not the GIL."""
+        if self._use_pool():
+            return self._pool.submit(_article, html, url).result()
+        from src.fetcher.article import extract_article
+        return extract_article(html, url)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
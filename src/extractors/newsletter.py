@@ -1,6 +1,7 @@
 """
 Extract main body text and content links from newsletter HTML.
 Excludes sponsor/unsubscribe/social links.
+extract_newsletter() parses the document once and returns title, body text and links together.
 """
 
 import re
@@ -8,6 +9,15 @@ from urllib.parse import urljoin, urlparse
 
 from bs4 import BeautifulSoup
 
+from src.fetcher.canonical import canonical_url
+
+try:
+    import lxml  # noqa: F401
+    # C-backed tree builder; html.parser is the pure-Python fallback
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
 # Link href substrings to skip (sponsor, unsubscribe, social, tracking)
 SKIP_LINK_PATTERNS = (
     "unsubscribe",
@@ -35,13 +45,35 @@ SKIP_TEXT_PATTERNS = (
 )
 
 
+def parse_html(html: str) -> BeautifulSoup:
+    """Parse HTML with the fastest available backend."""
+    return BeautifulSoup(html, HTML_PARSER)
+
+
+def extract_newsletter(html: str, base_url: str = "https://example.com/") -> dict:
+    """
+    Parse newsletter HTML once and extract everything the pipeline needs.
+    Returns {"title": str, "body_text": str, "links": [{"url", "text", "context"}, ...]}.
+    """
+    soup = parse_html(html)
+    t = soup.find("title")
+    title = (t.get_text() if t else "").strip()
+    # Links first: body extraction removes nav/footer from the tree
+    links = _links_from_soup(soup, base_url)
+    body_text = _body_from_soup(soup)
+    return {"title": title, "body_text": body_text, "links": links}
+
+
 def extract_body(html: str) -> str:
     """
     Get main body text from newsletter HTML.
     Prefer text from article/main content; strip nav, footer, unsubscribe blocks.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    return _body_from_soup(parse_html(html))
+
 
+def _body_from_soup(soup: BeautifulSoup) -> str:
+    """Body text from a parsed document. Mutates soup (removes script/style/nav/footer)."""
     # Remove script, style, nav, footer
     for tag in soup.find_all(["script", "style", "nav", "footer"]):
         tag.decompose()
@@ -70,7 +102,10 @@ def extract_links(html: str, base_url: str = "https://example.com/") -> list[dic
     Returns list of {"url": str, "text": str, "context": str} for links
     that look like article/source links (not sponsor, unsubscribe, social).
     """
-    soup = BeautifulSoup(html, "html.parser")
+    return _links_from_soup(parse_html(html), base_url)
+
+
+def _links_from_soup(soup: BeautifulSoup, base_url: str) -> list[dict]:
     seen_urls = set()
     out = []
 
@@ -79,14 +114,21 @@ def extract_links(html: str, base_url: str = "https://example.com/") -> list[dic
         if not href or href.startswith("#") or href.startswith("mailto:"):
             continue
 
-        url = urljoin(base_url, href)
-        parsed = urlparse(url)
+        try:
+            url = urljoin(base_url, href)
+            parsed = urlparse(url)
+        except ValueError:  # e.g. an unbalanced [ in the host
+            continue
         if not parsed.scheme in ("http", "https"):
             continue
 
         url_lower = url.lower()
         if any(p in url_lower for p in SKIP_LINK_PATTERNS):
             continue
+        # Unwrap redirectors that embed the target and drop tracking params
+        url = canonical_url(url)
+        if not url or any(p in url.lower() for p in SKIP_LINK_PATTERNS):
+            continue
 
         link_text = (a.get_text() or "").strip()[:200]
         if any(p in link_text.lower() for p in SKIP_TEXT_PATTERNS):
@@ -101,10 +143,9 @@ def extract_links(html: str, base_url: str = "https://example.com/") -> list[dic
         if any(p in context.lower() for p in SKIP_TEXT_PATTERNS):
             continue
 
-        norm = url.split("?")[0].rstrip("/")
-        if norm in seen_urls:
+        if url in seen_urls:
             continue
-        seen_urls.add(norm)
+        seen_urls.add(url)
 
         out.append({"url": url, "text": link_text, "context": context})
 
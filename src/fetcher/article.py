@@ -1,15 +1,34 @@
 """
 Fetch a URL and extract main article content (title, text) using readability.
+Fetches run concurrently on a thread pool; politeness is enforced per host with a token bucket.
+Extracted articles are kept in an on-disk cache and revalidated with conditional GETs.
+URLs are canonicalized (src.fetcher.canonical) so each article is fetched once per run.
 """
 
+import codecs
+import hashlib
+import json
 import re
+import sqlite3
+import threading
 import time
-from urllib.parse import urlparse
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Iterator
+from urllib.parse import urljoin, urlparse
 
 import requests
 from bs4 import BeautifulSoup
+from requests.structures import CaseInsensitiveDict
+
+import config
+from src import metrics, replay
+from src.fetcher import session
+from src.fetcher.canonical import Canonicalizer, canonical_url, default_canonicalizer
 
 try:
+    import lxml.html
+    from lxml.etree import ParserError
     from readability import Document
     HAS_READABILITY = True
 except ImportError:
@@ -18,8 +37,47 @@ except ImportError:
 # User-Agent to avoid some blocks
 USER_AGENT = "Mozilla/5.0 (compatible; NewsletterDigest/1.0; +https://github.com/newsletter-digest)"
 REQUEST_TIMEOUT = 15
-# Rate limit: pause between requests (seconds)
-REQUEST_DELAY = 0.5
+CHUNK_SIZE = 64 * 1024
+_META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([A-Za-z0-9_.:-]+)""", re.I)
+
+
+class HostRateLimiter:
+    """
+    Token bucket per host. Each host refills at `rate` tokens/sec up to `burst`.
+    acquire() reserves a token and sleeps until it is due, so requests to
+    different hosts never wait on each other.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = max(rate, 0.001)
+        self.burst = max(burst, 1)
+        self._lock = threading.Lock()
+        self._buckets: dict[str, list[float]] = {}  # host -> [tokens, last_refill]
+
+    def acquire(self, url: str, cancel: threading.Event | None = None) -> float:
+        """
+        Block until a token for url's host is available, or until cancel is set.
+        Returns seconds waited.
+        """
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            now = time.monotonic()
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = [float(self.burst), now]
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            tokens -= 1
+            bucket[0], bucket[1] = tokens, now
+            wait = -tokens / self.rate if tokens < 0 else 0.0
+        if wait > 0:
+            if cancel is not None:
+                cancel.wait(wait)
+            else:
+                time.sleep(wait)
+        return wait
+
+
+_default_limiter = HostRateLimiter(config.FETCH_HOST_RATE, config.FETCH_HOST_BURST)
 
 
 def fetch_url(url: str) -> tuple[int, str, str]:
@@ -27,81 +85,461 @@ def fetch_url(url: str) -> tuple[int, str, str]:
     GET url; return (status_code, content_type, body).
     On error returns (0, "", "") or (status_code, "", "").
     """
+    status, ct, body, _, _ = _get(url)
+    return (status, ct, body)
+
+
+def _get(
+    url: str,
+    headers: dict | None = None,
+    cancel: threading.Event | None = None,
+) -> tuple[int, str, str, dict, str]:
+    """
+    GET with extra request headers; like fetch_url but also returns the response headers
+    and the final URL after redirects. Recorded or replayed when an I/O archive is open.
+    Setting cancel abandons the request between retries and body chunks.
+    """
+    if replay.current() is None:
+        return _get_live(url, headers, cancel)
+
+    def live() -> list:
+        status, ct, body, resp_headers, final_url = _get_live(url, headers, cancel)
+        return [status, ct, body, dict(resp_headers), final_url]
+
+    status, ct, body, resp_headers, final_url = replay.http(
+        "GET", url, headers or {}, live, miss=[0, "", "Not in I/O archive", {}, url]
+    )
+    return (status, ct, body, CaseInsensitiveDict(resp_headers), final_url)
+
+
+def _get_live(
+    url: str,
+    headers: dict | None = None,
+    cancel: threading.Event | None = None,
+) -> tuple[int, str, str, dict, str]:
+    host = urlparse(url).netloc.lower()
+    start = time.perf_counter()
     try:
-        r = requests.get(
+        # Stream so non-HTML bodies are never downloaded and large pages stop at FETCH_MAX_BYTES
+        with session.get(
             url,
             timeout=REQUEST_TIMEOUT,
-            headers={"User-Agent": USER_AGENT},
+            headers={"User-Agent": USER_AGENT, **(headers or {})},
             allow_redirects=True,
-        )
-        ct = r.headers.get("Content-Type", "")
-        if "text/html" not in ct and "application/xhtml" not in ct:
-            return (r.status_code, ct, "")
-        return (r.status_code, ct, r.text)
+            stream=True,
+            cancel=cancel,
+        ) as r:
+            if r.status_code == 304:
+                return (304, "", "", r.headers, r.url)
+            ct = r.headers.get("Content-Type", "")
+            if "text/html" not in ct and "application/xhtml" not in ct:
+                metrics.incr("dropped.non_html")
+                return (r.status_code, ct, "", r.headers, r.url)
+            body = _read_capped(r, config.FETCH_MAX_BYTES, cancel)
     except requests.RequestException as e:
-        return (0, "", str(e))
+        metrics.incr("fetch.request_errors")
+        return (0, "", str(e), {}, url)
+    finally:
+        metrics.incr("fetch.requests")
+        metrics.observe_ms(f"fetch.latency_ms.{host}", (time.perf_counter() - start) * 1000)
+    metrics.incr("fetch.bytes", len(body))
+    return (r.status_code, ct, body.decode(_charset(r, body), errors="replace"), r.headers, r.url)
 
 
-def extract_article(html: str, url: str) -> dict:
+def _read_capped(r: requests.Response, max_bytes: int, cancel: threading.Event | None = None) -> bytes:
+    """Read at most max_bytes of the body; the rest of the page is never downloaded."""
+    buf = bytearray()
+    for chunk in r.iter_content(CHUNK_SIZE):
+        if cancel is not None and cancel.is_set():
+            raise session.Cancelled(r.url)
+        buf += chunk
+        if len(buf) > max_bytes:
+            # Article text sits near the top; extraction copes with the cut-off markup
+            metrics.incr("fetch.truncated")
+            del buf[max_bytes:]
+            break
+    return bytes(buf)
+
+
+def _charset(r: requests.Response, body: bytes) -> str:
+    """Charset from the Content-Type header, else a <meta> tag in the first chunk, else UTF-8."""
+    if "charset" in r.headers.get("Content-Type", "").lower() and r.encoding:
+        return _valid_codec(r.encoding)
+    m = _META_CHARSET_RE.search(body[:CHUNK_SIZE])
+    if m:
+        return _valid_codec(m.group(1).decode("ascii", errors="ignore"))
+    return "utf-8"
+
+
+def _valid_codec(name: str) -> str:
+    try:
+        codecs.lookup(name)
+        return name
+    except LookupError:
+        return "utf-8"
+
+
+class ArticleCache:
     """
-    Extract title and main text from HTML.
-    Returns {"title": str, "text": str, "snippet": str} (snippet = first ~300 chars of text).
+    On-disk (SQLite) cache of extracted articles keyed by canonical_url(url), with the ETag /
+    Last-Modified validators and a hash of the page. Entries younger than ttl are served
+    without a request; older ones are revalidated. At most max_entries are kept, evicting
+    the least recently used. Safe to share between threads (one connection per thread)
+    and processes (SQLite locking).
     """
-    soup = BeautifulSoup(html, "html.parser")
 
-    title = ""
-    text = ""
+    def __init__(self, path: Path | str, ttl: float | None = None, max_entries: int | None = None):
+        self.path = Path(path)
+        self.ttl = config.ARTICLE_CACHE_TTL_HOURS * 3600 if ttl is None else ttl
+        self.max_entries = config.ARTICLE_CACHE_MAX_ENTRIES if max_entries is None else max_entries
+        self._local = threading.local()
+        self._puts = 0
+        self._lock = threading.Lock()
 
-    if HAS_READABILITY:
-        try:
-            doc = Document(html)
-            title = doc.title() or ""
-            text = doc.summary()
-            soup = BeautifulSoup(text, "html.parser")
-            text = soup.get_text(separator="\n", strip=True)
-        except Exception:
-            pass
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS articles ("
+                "key TEXT PRIMARY KEY, url TEXT, result TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+                "content_hash TEXT, fetched_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS articles_accessed ON articles (accessed_at)")
+            self._local.conn = conn
+        return conn
 
-    if not text:
-        # Fallback: get body, remove script/style
-        for tag in soup.find_all(["script", "style", "nav", "footer", "aside"]):
-            tag.decompose()
-        body = soup.find("body") or soup
-        text = body.get_text(separator="\n", strip=True)
+    def get(self, url: str) -> dict | None:
+        """Cached entry {"result", "etag", "last_modified", "content_hash", "fresh"} or None."""
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT result, etag, last_modified, content_hash, fetched_at FROM articles WHERE key = ?",
+            (canonical_url(url),),
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE articles SET accessed_at = ? WHERE key = ?", (time.time(), canonical_url(url)))
+        return {
+            "result": json.loads(row[0]),
+            "etag": row[1],
+            "last_modified": row[2],
+            "content_hash": row[3],
+            "fresh": time.time() - row[4] < self.ttl,
+        }
+
+    def put(self, url: str, result: dict, etag: str = "", last_modified: str = "", content_hash: str = "") -> None:
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO articles VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (canonical_url(url), url, json.dumps(result), etag, last_modified, content_hash, now, now),
+            )
+        with self._lock:
+            self._puts += 1
+            evict = self._puts % 50 == 1
+        if evict:
+            self.evict()
+
+    def touch(self, url: str) -> None:
+        """Mark an entry as just revalidated (304 or unchanged content)."""
+        now = time.time()
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "UPDATE articles SET fetched_at = ?, accessed_at = ? WHERE key = ?",
+                (now, now, canonical_url(url)),
+            )
+
+    def evict(self) -> None:
+        """Drop least recently used entries beyond max_entries."""
+        conn = self._conn()
+        with conn:
+            conn.execute(
+                "DELETE FROM articles WHERE key IN ("
+                "SELECT key FROM articles ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+_default_cache: ArticleCache | None = None
+
+
+def default_cache() -> ArticleCache | None:
+    """Shared cache at config.ARTICLE_CACHE_PATH, or None if ARTICLE_CACHE_MAX_ENTRIES is 0."""
+    global _default_cache
+    if config.ARTICLE_CACHE_MAX_ENTRIES <= 0:
+        return None
+    if _default_cache is None:
+        _default_cache = ArticleCache(config.ARTICLE_CACHE_PATH)
+    return _default_cache
+
+
+def extract_article(html: str, url: str) -> dict:
+    """
+    Extract title and main text from HTML.
+    The document is parsed once with lxml and that tree is shared by readability,
+    the title lookup and the fallback body text; html.parser is used only without lxml.
+    Returns {"title": str, "text": str, "snippet": str, "canonical": str} (snippet = first
+    ~500 chars of text, canonical = the page's <link rel="canonical"> href or "").
+    """
+    if HAS_READABILITY:
+        title, text, canonical = _extract_lxml(html)
+    else:
+        title, text, canonical = _extract_soup(html)
 
     if not title:
-        t = soup.find("title")
-        title = (t.get_text() if t else "").strip() or urlparse(url).path or url
+        title = urlparse(url).path or url
 
     text = re.sub(r"\n{3,}", "\n\n", text).strip()
     snippet = (text[:500] + "…") if len(text) > 500 else text
 
-    return {"title": title[:300], "text": text, "snippet": snippet}
+    canonical = urljoin(url, canonical) if canonical else ""
+    return {"title": title[:300], "text": text, "snippet": snippet, "canonical": canonical}
+
+
+def _lxml_text(el) -> str:
+    """Equivalent of BeautifulSoup get_text(separator="\n", strip=True)."""
+    return "\n".join(s for s in (t.strip() for t in el.itertext()) if s)
+
+
+def _extract_lxml(html: str) -> tuple[str, str, str]:
+    try:
+        tree = lxml.html.document_fromstring(html)
+    except (ParserError, ValueError):
+        return "", "", ""
+    t = tree.find(".//title")
+    title = (t.text_content() if t is not None else "").strip()
+    hrefs = tree.xpath('//link[translate(@rel, "CANONICAL", "canonical")="canonical"]/@href')
+    canonical = hrefs[0].strip() if hrefs else ""
+
+    text = ""
+    try:
+        # Passing the tree (not the string) keeps readability from re-parsing the page
+        summary = Document(tree).summary(html_partial=True)
+        text = _lxml_text(lxml.html.fragment_fromstring(summary, create_parent="div"))
+    except Exception:
+        pass
+
+    if not text:
+        # Fallback: get body, remove script/style
+        for el in tree.xpath("//script|//style|//nav|//footer|//aside"):
+            el.drop_tree()
+        body = tree.find(".//body")
+        text = _lxml_text(body if body is not None else tree)
+    return title, text, canonical
 
 
-def fetch_and_extract(url: str, delay: bool = True) -> dict:
+def _extract_soup(html: str) -> tuple[str, str, str]:
+    soup = BeautifulSoup(html, "html.parser")
+    t = soup.find("title")
+    title = (t.get_text() if t else "").strip()
+    link = soup.find("link", rel="canonical", href=True)
+    canonical = link["href"].strip() if link else ""
+    for tag in soup.find_all(["script", "style", "nav", "footer", "aside"]):
+        tag.decompose()
+    body = soup.find("body") or soup
+    return title, body.get_text(separator="\n", strip=True), canonical
+
+
+def fetch_and_extract(
+    url: str,
+    delay: bool = True,
+    limiter: HostRateLimiter | None = None,
+    extractor=None,
+    use_cache: bool = True,
+    canonicalizer: Canonicalizer | None = None,
+    cancel: threading.Event | None = None,
+) -> dict:
     """
     Fetch URL and extract article content.
-    Returns dict with keys: url, title, text, snippet, error (if any), status_code.
+    If delay is True, wait for the host's rate limiter before requesting.
+    extractor (an ExtractionExecutor) moves parsing off this thread into its process pool.
+    With use_cache, a fresh cached article costs no request; a stale one is revalidated
+    with If-None-Match / If-Modified-Since, and unchanged pages are not re-extracted.
+    The result url is the article's canonical URL (after redirects and rel=canonical);
+    canonicalizer, if given, remembers the mapping for later runs.
+    Once cancel is set, the fetch stops at its next wait, retry or body chunk.
+    Returns dict with keys: url, title, snippet, error (if any), status_code. The full
+    article text is dropped once the snippet is taken.
     """
+    cache = default_cache() if use_cache else None
+    cached = cache.get(url) if cache else None
+    if cached and cached["fresh"]:
+        metrics.incr("fetch.cache_hits")
+        return cached["result"]
+
+    headers = {}
+    if cached:
+        if cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
     if delay:
-        time.sleep(REQUEST_DELAY)
-    status, _, body = fetch_url(url)
+        metrics.incr("fetch.rate_limit_wait_s", (limiter or _default_limiter).acquire(url, cancel))
+    if cancel is not None and cancel.is_set():
+        return _cancelled(url)
+    status, _, body, resp_headers, final_url = _get(url, headers, cancel)
+    if cancel is not None and cancel.is_set():
+        return _cancelled(url)
+    if status == 304 and cached:
+        metrics.incr("fetch.cache_revalidated")
+        cache.touch(url)
+        return cached["result"]
     if status != 200 or not body:
+        metrics.incr("dropped.fetch_error")
         return {
             "url": url,
             "title": "",
-            "text": "",
             "snippet": "",
             "error": f"HTTP {status}" if status else "Request failed",
             "status_code": status,
         }
-    extracted = extract_article(body, url)
-    return {
-        "url": url,
+
+    content_hash = hashlib.blake2b(body.encode("utf-8", errors="replace"), digest_size=16).hexdigest()
+    if cached and cached["content_hash"] == content_hash:
+        # Server ignored the validators but the page is unchanged: skip re-extraction
+        metrics.incr("fetch.cache_unchanged")
+        cache.touch(url)
+        return cached["result"]
+
+    start = time.perf_counter()
+    extracted = (extractor.extract_article if extractor else extract_article)(body, url)
+    # Summed across fetch threads, so it can exceed the fetch stage's wall time
+    metrics.incr("fetch.extract_s", time.perf_counter() - start)
+    target = _canonical_target(final_url, extracted.get("canonical", "")) or canonical_url(url) or url
+    if canonicalizer and target != canonical_url(url):
+        canonicalizer.record(url, target)
+    result = {
+        "url": target,
         "title": extracted["title"],
-        "text": extracted["text"],
         "snippet": extracted["snippet"],
         "error": None,
         "status_code": status,
     }
+    if cache:
+        cache.put(
+            url,
+            result,
+            etag=resp_headers.get("ETag", ""),
+            last_modified=resp_headers.get("Last-Modified", ""),
+            content_hash=content_hash,
+        )
+    return result
+
+
+def _cancelled(url: str) -> dict:
+    metrics.incr("fetch.cancelled")
+    return {"url": url, "title": "", "snippet": "", "error": "Cancelled", "status_code": 0}
+
+
+def _canonical_target(final_url: str, rel_canonical: str) -> str:
+    """The page's rel=canonical if it names an article (not a bare domain), else the final URL."""
+    canonical = canonical_url(rel_canonical)
+    if canonical and urlparse(canonical).path not in ("", "/"):
+        return canonical
+    return canonical_url(final_url)
+
+
+class FetchPool:
+    """
+    Thread pool for fetch_and_extract that accepts URLs while a run is still producing them.
+    Use as a context manager; submit() returns a Future for the fetch result dict.
+    URLs are resolved to their canonical form first (redirect map, HEAD for click trackers);
+    links that resolve to an article already being fetched share that fetch's result.
+    cancel() abandons queued fetches and stops running ones at their next wait, retry or
+    body chunk; the pool then exits without waiting for them.
+    """
+
+    def __init__(
+        self,
+        max_workers: int | None = None,
+        limiter: HostRateLimiter | None = None,
+        extractor=None,
+        use_cache: bool = True,
+        canonicalizer: Canonicalizer | None = None,
+    ):
+        self.limiter = limiter or _default_limiter
+        self.extractor = extractor
+        self.use_cache = use_cache
+        # The redirect map persists like the article cache; without it only offline rules apply
+        self.canonicalizer = canonicalizer or (default_canonicalizer() if use_cache else None)
+        self._by_target: dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, max_workers or config.FETCH_CONCURRENCY),
+            thread_name_prefix="fetch",
+        )
+
+    def submit(self, url: str) -> Future:
+        return self._pool.submit(self._fetch, url)
+
+    def cancel(self) -> None:
+        self._cancel.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _fetch(self, url: str) -> dict:
+        if self._cancel.is_set():
+            return _cancelled(url)
+        if self.canonicalizer:
+            # Tracker HEADs wait on the same per-host token bucket as article GETs
+            target = self.canonicalizer.canonical(url, cancel=self._cancel, limiter=self.limiter)
+        else:
+            target = canonical_url(url)
+        target = target or url
+        with self._lock:
+            shared = self._by_target.get(target)
+            if shared is None:
+                shared = self._by_target[target] = Future()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            metrics.incr("fetch.duplicates")
+            return shared.result()
+        try:
+            result = fetch_and_extract(
+                target,
+                limiter=self.limiter,
+                extractor=self.extractor,
+                use_cache=self.use_cache,
+                canonicalizer=self.canonicalizer,
+                cancel=self._cancel,
+            )
+        except BaseException as e:
+            shared.set_exception(e)
+            raise
+        shared.set_result(result)
+        return result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        if exc[0] is not None:
+            self.cancel()
+        self._pool.shutdown(wait=not self._cancel.is_set(), cancel_futures=self._cancel.is_set())
+
+
+def fetch_many(
+    urls: Iterable[str],
+    max_workers: int | None = None,
+    limiter: HostRateLimiter | None = None,
+    use_cache: bool = True,
+) -> Iterator[dict]:
+    """
+    Fetch and extract many URLs concurrently (at most max_workers in flight,
+    default config.FETCH_CONCURRENCY). Yields fetch_and_extract results in input order.
+    """
+    urls = list(urls)
+    if not urls:
+        return
+    workers = min(max_workers or config.FETCH_CONCURRENCY, len(urls))
+    with FetchPool(workers, limiter, use_cache=use_cache) as pool:
+        futures = [pool.submit(u) for u in urls]
+        for f in futures:
+            yield f.result()
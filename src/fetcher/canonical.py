@@ -0,0 +1,231 @@
+"""
+Canonical article URLs, shared by link extraction, fetching, the article cache and dedup.
+normalize() is offline: lowercase scheme/host, no default port, fragment or tracking
+params, sorted query. unwrap() decodes redirectors that carry their target in the URL
+(?url=..., Substack /redirect/2/<base64>). Opaque click trackers
+(Mailchimp, beehiiv, ...) are resolved with a HEAD request by Canonicalizer, which keeps
+the results, and <link rel=canonical> of fetched pages, in a persistent redirect map.
+"""
+
+import base64
+import binascii
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, unquote, urlencode, urlparse, urlunparse
+
+import requests
+
+import config
+from src import metrics, replay
+from src.fetcher import session
+
+# Query params that only identify the campaign/recipient, never the article
+TRACKING_PARAMS = frozenset({
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "_hsenc", "_hsmi", "mkt_tok",
+    "ref", "ref_src", "ref_url", "cmpid", "s_cid", "oly_anon_id", "oly_enc_id", "vero_id", "vero_conv",
+    "rh_ref", "triedredirect", "publication_id", "post_id", "isfreemail", "lctg", "sc_cid", "spm", "igshid",
+})
+TRACKING_PREFIXES = ("utm_", "mc_", "_hs", "pk_", "hsa_", "ga_", "__s")
+# Params that redirectors use for the destination URL
+TARGET_PARAMS = ("url", "u", "q", "target", "dest", "destination", "redirect", "redirect_url", "link", "to")
+DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+# Hosts (or host prefixes) whose links are click trackers that must be resolved over HTTP
+REDIRECTOR_HOSTS = (
+    "list-manage.com", "mailchi.mp", "link.mail.beehiiv.com", "mail.beehiiv.com", "substack.com",
+    "convertkit-mail.com", "convertkit-mail2.com", "ck.page", "sendgrid.net", "mailgun.org",
+    "rs6.net", "hubspotlinks.com", "hs-sites.com", "mjt.lu", "cmail19.com", "cmail20.com",
+    "createsend1.com", "t.co", "bit.ly", "lnkd.in", "buff.ly", "ow.ly", "tinyurl.com",
+)
+REDIRECTOR_HOST_PREFIXES = ("click.", "clicks.", "link.", "links.", "track.", "tracking.", "email.", "trk.", "go.")
+MAX_UNWRAP_DEPTH = 3
+HEAD_TIMEOUT = 10
+
+
+def normalize(url: str) -> str:
+    """Offline canonical form; "" for empty or non-http(s) input."""
+    url = (url or "").strip()
+    if not url:
+        return ""
+    try:
+        p = urlparse(url)
+        port = p.port
+    except ValueError:  # non-numeric port or unbalanced [ ] around the host
+        return ""
+    scheme = p.scheme.lower()
+    if scheme not in ("http", "https"):
+        return ""
+    host = (p.hostname or "").rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    netloc = host
+    if port and str(port) != DEFAULT_PORTS[scheme]:
+        netloc = f"{host}:{port}"
+    query = urlencode(sorted(
+        (k, v)
+        for k, v in parse_qsl(p.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    ))
+    return urlunparse((scheme, netloc, p.path or "/", p.params, query, ""))
+
+
+def unwrap(url: str) -> str:
+    """Follow redirectors that embed the destination in the URL itself (offline)."""
+    for _ in range(MAX_UNWRAP_DEPTH):
+        target = _embedded_target(url)
+        if not target:
+            break
+        metrics.incr("urls.unwrapped")
+        url = target
+    return url
+
+
+def _embedded_target(url: str) -> str:
+    p = urlparse(url)
+    params = dict(parse_qsl(p.query))
+    for name in TARGET_PARAMS:
+        value = params.get(name, "")
+        if value.startswith(("http://", "https://")):
+            return value
+        if value.startswith(("http%3A", "https%3A")):
+            return unquote(value)
+    # Substack: /redirect/2/<base64 JSON {"e": url, ...}>
+    parts = p.path.strip("/").split("/")
+    if len(parts) >= 3 and parts[0] == "redirect" and parts[1] == "2":
+        payload = parts[2].split(".")[0]
+        try:
+            data = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        except (binascii.Error, ValueError, UnicodeDecodeError):
+            return ""
+        if isinstance(data, dict) and str(data.get("e", "")).startswith(("http://", "https://")):
+            return data["e"]
+    return ""
+
+
+def is_redirector(url: str) -> bool:
+    """True for known click-tracking hosts whose destination is only known after a request."""
+    host = (urlparse(url).hostname or "").lower()
+    if any(host == h or host.endswith("." + h) for h in REDIRECTOR_HOSTS):
+        # substack.com itself hosts articles; only its /redirect/ paths are trackers
+        return not (host.endswith("substack.com") and "/redirect/" not in urlparse(url).path)
+    return host.startswith(REDIRECTOR_HOST_PREFIXES)
+
+
+def canonical_url(url: str) -> str:
+    """Offline canonicalization: unwrap embedded redirects, then normalize; "" if malformed."""
+    try:
+        return normalize(unwrap((url or "").strip()))
+    except ValueError:
+        return ""
+
+
+class Canonicalizer:
+    """
+    Resolves click-tracking URLs to the article they point at (HEAD, following redirects)
+    and remembers every mapping, including rel=canonical from fetched pages, in SQLite so
+    later runs skip the round trips. Thread-safe (one connection per thread).
+    """
+
+    def __init__(self, path: Path | str | None = None, max_entries: int | None = None):
+        self.path = Path(path or config.URL_MAP_PATH)
+        self.max_entries = config.URL_MAP_MAX_ENTRIES if max_entries is None else max_entries
+        self._local = threading.local()
+        self._puts = 0
+        self._lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS redirects ("
+                "url TEXT PRIMARY KEY, target TEXT NOT NULL, updated_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS redirects_updated ON redirects (updated_at)")
+            self._local.conn = conn
+        return conn
+
+    def lookup(self, url: str) -> str:
+        """Stored target for a canonical url, or ""."""
+        row = self._conn().execute("SELECT target FROM redirects WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else ""
+
+    def record(self, url: str, target: str) -> None:
+        """Remember that url (any form) leads to target."""
+        url, target = canonical_url(url), canonical_url(target)
+        if not url or not target or url == target:
+            return
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO redirects VALUES (?, ?, ?)", (url, target, time.time()))
+        with self._lock:
+            self._puts += 1
+            prune = self._puts % 100 == 1
+        if prune:
+            with conn:
+                conn.execute(
+                    "DELETE FROM redirects WHERE url IN ("
+                    "SELECT url FROM redirects ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def canonical(
+        self,
+        url: str,
+        resolve: bool = True,
+        cancel: threading.Event | None = None,
+        limiter=None,
+    ) -> str:
+        """
+        Canonical URL of the article behind url: offline unwrap/normalize, then the redirect
+        map, then (for known redirectors, if resolve) a HEAD request whose result is stored.
+        limiter (a HostRateLimiter) paces the HEAD per tracker host like article GETs.
+        The HEAD is skipped, and url returned as is, once cancel is set.
+        """
+        url = canonical_url(url)
+        if not url:
+            return ""
+        target = self.lookup(url)
+        if target:
+            metrics.incr("urls.redirect_map_hits")
+            return target
+        if not (resolve and is_redirector(url)) or (cancel is not None and cancel.is_set()):
+            return url
+        if limiter is not None:
+            metrics.incr("fetch.rate_limit_wait_s", limiter.acquire(url, cancel))
+            if cancel is not None and cancel.is_set():
+                return url
+        final = replay.http("HEAD", url, {}, lambda: _head_final_url(url, cancel))
+        if not final:
+            metrics.incr("urls.resolve_errors")
+            return url
+        metrics.incr("urls.resolved")
+        self.record(url, final)
+        return canonical_url(final) or url
+
+
+def _head_final_url(url: str, cancel: threading.Event | None = None) -> str | None:
+    """URL a HEAD request for url ends up at after redirects, or None on error."""
+    try:
+        with session.get(url, method="HEAD", timeout=HEAD_TIMEOUT, allow_redirects=True, cancel=cancel) as r:
+            return r.url
+    except requests.RequestException:
+        return None
+
+
+_default_canonicalizer: Canonicalizer | None = None
+_default_lock = threading.Lock()
+
+
+def default_canonicalizer() -> Canonicalizer:
+    """Shared canonicalizer backed by config.URL_MAP_PATH."""
+    global _default_canonicalizer
+    with _default_lock:
+        if _default_canonicalizer is None:
+            _default_canonicalizer = Canonicalizer()
+        return _default_canonicalizer
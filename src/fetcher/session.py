@@ -0,0 +1,142 @@
+"""
+Shared HTTP session for article fetches: keep-alive connection pools per host, plus
+retries of transient failures (connection errors, 429, 5xx) with exponential backoff,
+jitter and Retry-After. Retries draw from a per-run budget (count and deadline) so a
+misbehaving host can't stretch the run, and a cancel event stops a request between attempts.
+"""
+
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from src import metrics
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Longest backoff between attempts; a Retry-After asking for more ends the request instead
+MAX_BACKOFF_S = 30.0
+
+
+class Cancelled(requests.RequestException):
+    """The request was abandoned because its cancel event was set."""
+
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """
+    Process-wide session. Its urllib3 pools are thread-safe, so fetch threads share it;
+    FETCH_POOL_HOSTS hosts keep up to FETCH_POOL_SIZE idle connections each.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            # Retries are ours (budgeted, Retry-After aware), not urllib3's
+            adapter = HTTPAdapter(
+                pool_connections=config.FETCH_POOL_HOSTS,
+                pool_maxsize=config.FETCH_POOL_SIZE,
+                max_retries=0,
+            )
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+
+class RetryBudget:
+    """Retries allowed for one run: at most max_retries, none that would end after deadline_s."""
+
+    def __init__(self, max_retries: int | None = None, deadline_s: float | None = None):
+        self.remaining = config.FETCH_RETRY_BUDGET if max_retries is None else max_retries
+        self.deadline = time.monotonic() + (config.FETCH_RETRY_DEADLINE_S if deadline_s is None else deadline_s)
+        self._lock = threading.Lock()
+
+    def take(self, delay: float) -> bool:
+        """Claim one retry after sleeping delay seconds; False if the budget is spent."""
+        with self._lock:
+            if self.remaining <= 0 or time.monotonic() + delay > self.deadline:
+                return False
+            self.remaining -= 1
+            return True
+
+
+_budget = RetryBudget()
+
+
+def reset_retry_budget() -> RetryBudget:
+    """Start a fresh per-run budget (called at the start of each run)."""
+    global _budget
+    _budget = RetryBudget()
+    return _budget
+
+
+def retry_after_seconds(value: str | None) -> float | None:
+    """Parse a Retry-After header (delta seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def get(
+    url: str,
+    budget: RetryBudget | None = None,
+    method: str = "GET",
+    cancel: threading.Event | None = None,
+    **kwargs,
+) -> requests.Response:
+    """
+    GET (or HEAD) through the shared session, retrying transient failures up to
+    FETCH_MAX_RETRIES times while the run's budget allows. Returns the last response (use it
+    as a context manager when streaming); raises the last RequestException if none came back.
+    Once cancel is set, no new attempt is made (and a backoff sleep ends): raises Cancelled.
+    """
+    budget = budget or _budget
+    session = get_session()
+    attempt = 0
+    while True:
+        if cancel is not None and cancel.is_set():
+            raise Cancelled(url)
+        try:
+            r = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            r, error = None, e
+        else:
+            if r.status_code not in RETRYABLE_STATUSES:
+                return r
+            error = None
+        delay = min(2 ** attempt, MAX_BACKOFF_S) + random.random()
+        if r is not None:
+            retry_after = retry_after_seconds(r.headers.get("Retry-After"))
+            if retry_after is not None and retry_after > MAX_BACKOFF_S:
+                # Not worth parking a fetch thread for: give up with this response
+                metrics.incr("fetch.retry_after_too_long")
+                return r
+            if retry_after is not None:
+                delay = retry_after + random.random()
+        if attempt >= config.FETCH_MAX_RETRIES or not budget.take(delay):
+            if attempt < config.FETCH_MAX_RETRIES:
+                metrics.incr("fetch.retry_budget_exhausted")
+            if r is not None:
+                return r
+            raise error
+        if r is not None:
+            r.close()
+        metrics.incr("fetch.retries")
+        if cancel is not None:
+            cancel.wait(delay)
+        else:
+            time.sleep(delay)
+        attempt += 1
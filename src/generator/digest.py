@@ -1,66 +1,265 @@
 """
-Build the digest HTML (email-safe: inline styles) and return as string.
+Build the digest HTML and return it as a string, or stream it to a file (write_digest).
+Styles are declared once in a head <style> block and referenced by short class names;
+inline_styles=True repeats them on each element for clients that drop <style>.
+Gmail clips messages over ~102 KB, so rendering is held to a byte budget: snippets are
+trimmed first, then lower-priority categories collapse to title-only lists, and
+write_digest splits what still doesn't fit into numbered parts.
 """
 
 from datetime import date
 from html import escape
+from pathlib import Path
+from typing import Iterator
 
+from src.pipeline.items import Item
 
-def build_digest_html(
-    items_by_category: dict[str, list[dict]],
-    digest_date: date | None = None,
-    total_newsletters: int = 0,
-    total_messages: int = 0,
-) -> str:
-    """
-    items_by_category: { "Category Name": [ {"title", "url", "snippet", "newsletter_names", "message_ids"}, ... ], ... }
-    """
-    d = digest_date or date.today()
-    date_str = d.strftime("%B %d, %Y")
-    title = f"Newsletter Digest — {d.strftime('%Y-%m-%d')}"
+# name -> (class, css)
+STYLES = {
+    "body": ("b", "font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Helvetica, Arial, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; color: #333; background: #fff;"),
+    "h1": ("t", "font-size: 2em; margin-bottom: 0.2em; border-bottom: 2px solid #000; padding-bottom: 10px;"),
+    "date": ("d", "color: #666; font-style: italic; margin-bottom: 2em;"),
+    "h2": ("c", "font-size: 1.5em; margin-top: 2em; margin-bottom: 0.5em; color: #000;"),
+    "item": ("i", "margin-bottom: 1.5em; padding-bottom: 1em; border-bottom: 1px solid #eee;"),
+    "h3": ("h", "font-size: 1.2em; margin-top: 0; margin-bottom: 0.3em;"),
+    "a": ("a", "color: #0066cc; text-decoration: none;"),
+    "src": ("s", "font-size: 0.9em; color: #666; font-style: italic; margin: 0.3em 0;"),
+    "snip": ("p", "margin: 0.5em 0;"),
+    "brief": ("l", "margin: 0.3em 0;"),
+    "foot": ("f", "font-size: 0.85em; color: #999; margin-top: 3em; padding-top: 1em; border-top: 2px solid #eee;"),
+}
 
-    # Section order: put "Other" last
-    categories = list(items_by_category.keys())
-    if "Other" in categories:
-        categories.remove("Other")
-        categories.append("Other")
+# Snippet lengths tried in turn until the digest fits the budget
+SNIPPET_STEPS = (400, 200, 80)
+
+# A section is (category, items, snippet chars); snippet chars None renders titles only
+Section = tuple[str, list[Item], int | None]
+
+
+class _Styler:
+    def __init__(self, inline: bool):
+        self.inline = inline
+
+    def __call__(self, name: str) -> str:
+        cls, css = STYLES[name]
+        return f' style="{css}"' if self.inline else f' class="{cls}"'
+
+    def head(self) -> str:
+        if self.inline:
+            return ""
+        return "<style>" + "".join(f".{cls}{{{css}}}" for cls, css in STYLES.values()) + "</style>"
 
-    parts = [
+
+def _size(lines) -> int:
+    """Bytes of lines joined with newlines (plus a trailing one)."""
+    return sum(len(line.encode("utf-8")) + 1 for line in lines)
+
+
+def _head_lines(st: _Styler, d: date, part: tuple[int, int] | None) -> list[str]:
+    title = f"Newsletter Digest — {d.strftime('%Y-%m-%d')}"
+    date_str = d.strftime("%B %d, %Y")
+    if part:
+        title += f" (part {part[0]} of {part[1]})"
+        date_str += f" — part {part[0]} of {part[1]}"
+    lines = [
         "<!DOCTYPE html>",
         '<html lang="en">',
         "<head>",
         '<meta charset="UTF-8">',
         '<meta name="viewport" content="width=device-width, initial-scale=1.0">',
         f"<title>{escape(title)}</title>",
+    ]
+    if not st.inline:
+        lines.append(st.head())
+    lines += [
         "</head>",
-        "<body style=\"font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Helvetica, Arial, sans-serif; line-height: 1.6; max-width: 800px; margin: 0 auto; padding: 20px; color: #333; background: #fff;\">",
-        "<h1 style=\"font-size: 2em; margin-bottom: 0.2em; border-bottom: 2px solid #000; padding-bottom: 10px;\">Newsletter Digest</h1>",
-        f"<p style=\"color: #666; font-style: italic; margin-bottom: 2em;\">{escape(date_str)}</p>",
+        f"<body{st('body')}>",
+        f"<h1{st('h1')}>Newsletter Digest</h1>",
+        f"<p{st('date')}>{escape(date_str)}</p>",
+    ]
+    return lines
+
+
+def _foot_lines(st: _Styler, total_newsletters: int, total_messages: int | None) -> list[str]:
+    lines = [
+        f"<div{st('foot')}>",
+        f"<p><strong>Newsletters processed:</strong> {total_newsletters}</p>",
     ]
+    if total_messages is not None:
+        lines.append(f"<p><strong>Messages examined:</strong> {total_messages}</p>")
+    return lines + ["</div>", "</body>", "</html>"]
 
-    for cat in categories:
-        items = items_by_category.get(cat, [])
-        if not items:
-            continue
-        parts.append(f"<h2 style=\"font-size: 1.5em; margin-top: 2em; margin-bottom: 0.5em; color: #000;\">{escape(cat)}</h2>")
+
+def _item_lines(st: _Styler, it: Item, snippet_chars: int) -> list[str]:
+    title_text = it.title or "Untitled"
+    url = it.url or "#"
+    snippet = it.snippet[:snippet_chars]
+    sources_str = ", ".join(escape(n) for n in it.newsletter_names)
+    lines = [
+        f"<div{st('item')}>",
+        f"<h3{st('h3')}><a href=\"{escape(url)}\"{st('a')}>{escape(title_text)}</a></h3>",
+        f"<p{st('src')}>Sources: {sources_str}</p>",
+    ]
+    if snippet:
+        lines.append(f"<p{st('snip')}>{escape(snippet)}</p>")
+    lines.append("</div>")
+    return lines
+
+
+def _brief_line(st: _Styler, it: Item) -> str:
+    url = it.url or "#"
+    title_text = escape(it.title or "Untitled")
+    sources_str = ", ".join(escape(n) for n in it.newsletter_names)
+    return f"<li{st('brief')}><a href=\"{escape(url)}\"{st('a')}>{title_text}</a> — {sources_str}</li>"
+
+
+def _section_lines(st: _Styler, section: Section) -> Iterator[str]:
+    cat, items, snippet_chars = section
+    yield f"<h2{st('h2')}>{escape(cat)}</h2>"
+    if snippet_chars is None:
+        yield "<ul>"
         for it in items:
-            title_text = it.get("title") or "Untitled"
-            url = it.get("url") or "#"
-            snippet = (it.get("snippet") or "")[:400]
-            newsletters = it.get("newsletter_names") or []
-            sources_str = ", ".join(escape(n) for n in newsletters)
-            parts.append("<div style=\"margin-bottom: 1.5em; padding-bottom: 1em; border-bottom: 1px solid #eee;\">")
-            parts.append(f"<h3 style=\"font-size: 1.2em; margin-top: 0; margin-bottom: 0.3em;\"><a href=\"{escape(url)}\" style=\"color: #0066cc; text-decoration: none;\">{escape(title_text)}</a></h3>")
-            parts.append(f"<p style=\"font-size: 0.9em; color: #666; font-style: italic; margin: 0.3em 0;\">Sources: {sources_str}</p>")
-            if snippet:
-                parts.append(f"<p style=\"margin: 0.5em 0;\">{escape(snippet)}</p>")
-            parts.append("</div>")
-
-    parts.append("<div style=\"font-size: 0.85em; color: #999; margin-top: 3em; padding-top: 1em; border-top: 2px solid #eee;\">")
-    parts.append(f"<p><strong>Newsletters processed:</strong> {total_newsletters}</p>")
-    parts.append(f"<p><strong>Messages examined:</strong> {total_messages}</p>")
-    parts.append("</div>")
-    parts.append("</body>")
-    parts.append("</html>")
-
-    return "\n".join(parts)
+            yield _brief_line(st, it)
+        yield "</ul>"
+    else:
+        for it in items:
+            yield from _item_lines(st, it, snippet_chars)
+
+
+def _ordered(items_by_category: dict[str, list[Item]]) -> list[tuple[str, list[Item]]]:
+    """Non-empty categories in priority order: as given, with "Other" last."""
+    categories = list(items_by_category.keys())
+    if "Other" in categories:
+        categories.remove("Other")
+        categories.append("Other")
+    return [(cat, items_by_category[cat]) for cat in categories if items_by_category.get(cat)]
+
+
+def _plan(
+    categories: list[tuple[str, list[Item]]],
+    st: _Styler,
+    budget: int | None,
+    overhead: int,
+    split: bool,
+) -> list[list[Section]]:
+    """
+    Sections of each part. Within budget bytes: trim snippets, then collapse categories
+    from the lowest priority up (the top one always keeps its snippets), then split.
+    """
+    def fits(sections: list[Section]) -> bool:
+        return overhead + sum(_size(_section_lines(st, s)) for s in sections) <= budget
+
+    sections = [(cat, items, SNIPPET_STEPS[0]) for cat, items in categories]
+    if budget is None or fits(sections):
+        return [sections]
+    for chars in SNIPPET_STEPS[1:]:
+        sections = [(cat, items, chars) for cat, items in categories]
+        if fits(sections):
+            return [sections]
+    for i in range(len(sections) - 1, 0, -1):
+        cat, items, _ = sections[i]
+        sections[i] = (cat, items, None)
+        if fits(sections):
+            return [sections]
+    if not split:
+        return [sections]
+    return _split(categories, st, budget - overhead, SNIPPET_STEPS[1])
+
+
+def _split(
+    categories: list[tuple[str, list[Item]]],
+    st: _Styler,
+    budget: int,
+    snippet_chars: int,
+) -> list[list[Section]]:
+    """Pack items in order into parts of at most budget bytes; a category may span parts."""
+    parts: list[list[Section]] = [[]]
+    used = 0
+    for cat, items in categories:
+        heading = _size([f"<h2{st('h2')}>{escape(cat)}</h2>"])
+        section: Section | None = None
+        for it in items:
+            size = _size(_item_lines(st, it, snippet_chars))
+            need = size + (heading if section is None else 0)
+            if used + need > budget and used:
+                parts.append([])
+                used, section = 0, None
+                need = size + heading
+            if section is None:
+                section = (cat, [], snippet_chars)
+                parts[-1].append(section)
+            section[1].append(it)
+            used += need
+    return parts
+
+
+def _document_lines(
+    st: _Styler,
+    sections: list[Section],
+    d: date,
+    part: tuple[int, int] | None,
+    total_newsletters: int,
+    total_messages: int | None,
+) -> Iterator[str]:
+    yield from _head_lines(st, d, part)
+    for section in sections:
+        yield from _section_lines(st, section)
+    yield from _foot_lines(st, total_newsletters, total_messages)
+
+
+def _overhead(st: _Styler, d: date, split: bool, total_newsletters: int, total_messages: int | None) -> int:
+    # Reserve room for the widest part label, since the part count isn't known yet
+    part = (99, 99) if split else None
+    return _size(_head_lines(st, d, part)) + _size(_foot_lines(st, total_newsletters, total_messages))
+
+
+def build_digest_html(
+    items_by_category: dict[str, list[Item]],
+    digest_date: date | None = None,
+    total_newsletters: int = 0,
+    total_messages: int | None = 0,
+    max_bytes: int | None = None,
+    inline_styles: bool = False,
+) -> str:
+    """
+    items_by_category: { "Category Name": [Item, ...], ... }
+    total_messages None leaves the "Messages examined" line out of the footer.
+    With max_bytes, snippets are trimmed and categories collapsed to stay under it (never split).
+    """
+    d = digest_date or date.today()
+    st = _Styler(inline_styles)
+    categories = _ordered(items_by_category)
+    overhead = _overhead(st, d, False, total_newsletters, total_messages)
+    sections = _plan(categories, st, max_bytes, overhead, split=False)[0]
+    return "\n".join(_document_lines(st, sections, d, None, total_newsletters, total_messages))
+
+
+def write_digest(
+    path: Path,
+    items_by_category: dict[str, list[Item]],
+    digest_date: date | None = None,
+    total_newsletters: int = 0,
+    total_messages: int | None = 0,
+    max_bytes: int | None = None,
+    inline_styles: bool = False,
+) -> list[Path]:
+    """
+    Stream the digest to path, line by line, within max_bytes per file. If it must be split,
+    part 1 is written to path and part n to <stem>-part<n><suffix>. Returns the paths in order.
+    """
+    d = digest_date or date.today()
+    st = _Styler(inline_styles)
+    categories = _ordered(items_by_category)
+    overhead = _overhead(st, d, True, total_newsletters, total_messages)
+    plan = _plan(categories, st, max_bytes, overhead, split=True)
+
+    paths = []
+    for n, sections in enumerate(plan, start=1):
+        out = path if n == 1 else path.with_name(f"{path.stem}-part{n}{path.suffix}")
+        part = (n, len(plan)) if len(plan) > 1 else None
+        with open(out, "w", encoding="utf-8") as f:
+            for line in _document_lines(st, sections, d, part, total_newsletters, total_messages):
+                f.write(line)
+                f.write("\n")
+        paths.append(out)
+    return paths
@@ -1,13 +1,16 @@
 """
 Obtain Gmail API credentials from refresh token (CI) or token.json (local).
+With a refresh token, the short-lived access token is cached with its expiry
+(config.GMAIL_ACCESS_TOKEN_CACHE), so back-to-back runs skip the refresh round trip.
+google-auth is imported on first use, not at import time.
 """
 
+import hashlib
+import json
+import os
+from datetime import datetime
 from pathlib import Path
 
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google_auth_oauthlib.flow import InstalledAppFlow
-
 import config
 
 
@@ -17,20 +20,28 @@ def get_credentials():
     Prefers env vars (GMAIL_CLIENT_ID, GMAIL_CLIENT_SECRET, GMAIL_REFRESH_TOKEN)
     for CI; falls back to credentials.json + token.json for local.
     """
-    # CI / GitHub Actions: use refresh token from env
+    from google.oauth2.credentials import Credentials
+    from google.auth.transport.requests import Request
+
+    # CI / GitHub Actions: use refresh token from env, and the cached access token if still valid
     if config.GMAIL_REFRESH_TOKEN and config.GMAIL_CLIENT_ID and config.GMAIL_CLIENT_SECRET:
-        return Credentials(
-            token=None,
+        token, expiry = _load_access_token()
+        creds = Credentials(
+            token=token,
+            expiry=expiry,
             refresh_token=config.GMAIL_REFRESH_TOKEN,
             token_uri="https://oauth2.googleapis.com/token",
             client_id=config.GMAIL_CLIENT_ID,
             client_secret=config.GMAIL_CLIENT_SECRET,
             scopes=config.GMAIL_SCOPES,
         )
+        if not creds.valid:
+            creds.refresh(Request())
+            _save_access_token(creds.token, creds.expiry)
+        return creds
 
     # Local: use token.json (and refresh if needed)
     token_path = Path(config.GMAIL_TOKEN_PATH)
-    credentials_path = Path(config.GMAIL_CREDENTIALS_PATH)
 
     if not token_path.exists():
         raise FileNotFoundError(
@@ -46,3 +57,48 @@ def get_credentials():
             f.write(creds.to_json())
 
     return creds
+
+
+def _account_key() -> str:
+    """Identifies the account behind the refresh token without storing the token itself."""
+    return hashlib.sha256(config.GMAIL_REFRESH_TOKEN.encode("utf-8")).hexdigest()
+
+
+def _load_access_token() -> tuple[str | None, datetime | None]:
+    """Cached (token, expiry) for the configured client, account and scopes, or (None, None)."""
+    path = config.GMAIL_ACCESS_TOKEN_CACHE
+    if not path:
+        return None, None
+    try:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if (
+            data["client_id"] != config.GMAIL_CLIENT_ID
+            or data["refresh_token_sha256"] != _account_key()
+            or data["scopes"] != config.GMAIL_SCOPES
+        ):
+            return None, None
+        # google-auth compares expiry as naive UTC
+        return data["token"], datetime.fromisoformat(data["expiry"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
+
+
+def _save_access_token(token: str | None, expiry: datetime | None) -> None:
+    path = config.GMAIL_ACCESS_TOKEN_CACHE
+    if not path or not token or not expiry:
+        return
+    path = Path(path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Owner-only: the token grants mailbox access until it expires
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({
+                "client_id": config.GMAIL_CLIENT_ID,
+                "refresh_token_sha256": _account_key(),
+                "scopes": config.GMAIL_SCOPES,
+                "token": token,
+                "expiry": expiry.isoformat(),
+            }, f)
+    except OSError as e:
+        print(f"Warning: could not cache Gmail access token: {e}")
@@ -1,30 +1,119 @@
 """
-Gmail API wrapper: list messages (with pagination), get body, send, mark as read.
+Gmail API wrapper: list messages (with pagination, or incrementally via the History API),
+get body, send, mark as read. Every call draws on one process-wide QuotaLimiter
+(config.GMAIL_QUOTA_UNITS_PER_S), shared by all clients.
+googleapiclient and the auth stack are imported when a service is built, so importing
+this module (e.g. for the message helpers) stays cheap.
 """
 
 import base64
 import email
+import random
+import threading
+import time
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from typing import Iterator
 
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-
+import config
+from src import metrics
 from .auth import get_credentials
 
 
 # Search query for unread in inbox; caller appends newer_than
 DEFAULT_QUERY = "in:inbox is:unread"
 
+# Headers requested in the metadata-only triage phase (enough for filters.is_newsletter)
+TRIAGE_HEADERS = ("From", "Subject", "List-Id", "List-Unsubscribe", "Precedence")
+
+# Gmail batch endpoint accepts at most 100 sub-requests per batch
+BATCH_MAX_SIZE = 100
+# Per-item HTTP statuses worth retrying inside a batch
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+BATCH_MAX_RETRIES = 5
+# users.messages.batchModify accepts at most 1000 ids per call
+BATCH_MODIFY_MAX_IDS = 1000
+
+# Gmail API quota units per call (a batch costs the sum of its sub-requests)
+QUOTA_UNITS = {
+    "messages.list": 5,
+    "messages.get": 5,
+    "messages.modify": 5,
+    "messages.batchModify": 50,
+    "messages.send": 100,
+    "history.list": 2,
+    "getProfile": 1,
+}
+
+
+class QuotaLimiter:
+    """
+    Shared budget of Gmail quota units per second (the per-user limit), so concurrent
+    clients, e.g. the shards of a backfill, pace themselves instead of drawing 429s.
+    acquire(units) reserves the units and sleeps until they are due; up to one second
+    of units may be spent in a burst. Thread-safe.
+    """
+
+    def __init__(self, units_per_s: float):
+        self.rate = units_per_s
+        self._lock = threading.Lock()
+        self._tokens = max(units_per_s, 0.0)
+        self._last = time.monotonic()
+
+    def acquire(self, units: float) -> float:
+        """Block until units are available (no-op when the rate is 0). Returns seconds waited."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate) - units
+            self._last = now
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            metrics.observe_ms("gmail.quota_wait_ms", wait * 1000)
+            time.sleep(wait)
+        return wait
+
+
+_quota = QuotaLimiter(config.GMAIL_QUOTA_UNITS_PER_S)
+
+
+def _charge(method: str, calls: int = 1) -> None:
+    _quota.acquire(QUOTA_UNITS[method] * calls)
+
+
+class _CountingHttp:
+    """Wraps the authorized http object to count Gmail HTTP round trips, bytes and latency."""
+
+    def __init__(self, http):
+        self._http = http
+
+    def request(self, *args, **kwargs):
+        start = time.perf_counter()
+        resp, content = self._http.request(*args, **kwargs)
+        metrics.observe_ms("gmail.latency_ms", (time.perf_counter() - start) * 1000)
+        metrics.incr("gmail.http_requests")
+        metrics.incr("gmail.bytes", len(content or b""))
+        return resp, content
+
+    def __getattr__(self, name):
+        return getattr(self._http, name)
+
 
 def _get_service():
-    creds = get_credentials()
-    # Ensure we have a valid token (refresh if using refresh_token from env)
-    if not creds.valid and creds.refresh_token:
-        from google.auth.transport.requests import Request
-        creds.refresh(Request())
-    return build("gmail", "v1", credentials=creds)
+    import google_auth_httplib2
+    import httplib2
+    from googleapiclient.discovery import build
+
+    with metrics.stage("gmail_auth"):
+        creds = get_credentials()
+        # Ensure we have a valid token (refresh if using refresh_token from env)
+        if not creds.valid and creds.refresh_token:
+            from google.auth.transport.requests import Request
+            creds.refresh(Request())
+    http = _CountingHttp(google_auth_httplib2.AuthorizedHttp(creds, http=httplib2.Http()))
+    # Discovery document from the copy packaged with googleapiclient: no network round trip
+    return build("gmail", "v1", http=http, static_discovery=True, cache_discovery=False)
 
 
 def list_message_ids(service, query: str, max_results: int = 500) -> Iterator[str]:
@@ -32,7 +121,9 @@ def list_message_ids(service, query: str, max_results: int = 500) -> Iterator[st
     # Only pass userId and q to avoid googleapiclient discovery casting bug (maxResults as int)
     request = service.users().messages().list(userId="me", q=query)
     while request is not None:
+        _charge("messages.list")
         response = request.execute()
+        metrics.incr("gmail.list_pages")
         for msg in response.get("messages", []):
             yield msg["id"]
         request = service.users().messages().list_next(request, response)
@@ -40,11 +131,110 @@ def list_message_ids(service, query: str, max_results: int = 500) -> Iterator[st
             break
 
 
+class HistoryExpired(Exception):
+    """The start historyId is too old for users.history.list; a full (query) sync is needed."""
+
+
+def get_history_id(service) -> str:
+    """Mailbox's current historyId; sync from it next time to see only newer changes."""
+    _charge("getProfile")
+    return str(service.users().getProfile(userId="me").execute()["historyId"])
+
+
+def list_history_message_ids(
+    service,
+    start_history_id: str,
+    label_ids: tuple[str, ...] = ("INBOX", "UNREAD"),
+) -> Iterator[str]:
+    """
+    Yield ids of messages added to the inbox since start_history_id that carried all of
+    label_ids when added. Raises HistoryExpired if Gmail no longer has that history
+    (ids are kept for about a week, sometimes less).
+    """
+    request = service.users().history().list(
+        userId="me", startHistoryId=start_history_id, historyTypes="messageAdded", labelId="INBOX"
+    )
+    from googleapiclient.errors import HttpError
+
+    seen = set()
+    while request is not None:
+        _charge("history.list")
+        try:
+            response = request.execute()
+        except HttpError as e:
+            if e.resp.status == 404:
+                raise HistoryExpired(start_history_id) from e
+            raise
+        metrics.incr("gmail.history_pages")
+        for record in response.get("history", []):
+            for added in record.get("messagesAdded", []):
+                msg = added["message"]
+                if msg["id"] in seen or not set(label_ids) <= set(msg.get("labelIds", [])):
+                    continue
+                seen.add(msg["id"])
+                yield msg["id"]
+        request = service.users().history().list_next(request, response)
+
+
 def get_message(service, message_id: str) -> dict:
     """Get full message with payload (headers + body)."""
+    _charge("messages.get")
     return service.users().messages().get(userId="me", id=message_id, format="full").execute()
 
 
+def get_messages(
+    service,
+    message_ids,
+    format: str = "full",
+    batch_size: int = BATCH_MAX_SIZE,
+    max_retries: int = BATCH_MAX_RETRIES,
+    metadata_headers: list[str] | tuple[str, ...] | None = None,
+) -> Iterator[dict]:
+    """
+    Get many messages through the batch HTTP endpoint, batch_size ids per round trip.
+    With format="metadata", only metadata_headers are returned (no body payload).
+    Items that fail with 429/5xx are retried in a later batch with exponential backoff
+    and jitter; other failures are logged and skipped. Yields messages as each batch returns.
+    """
+    batch_size = max(1, min(batch_size, BATCH_MAX_SIZE))
+    pending = list(dict.fromkeys(message_ids))
+    attempt = 0
+    while pending:
+        retry: list[str] = []
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            received: list[dict] = []
+
+            def _callback(request_id, response, exception, received=received):
+                if exception is None:
+                    received.append(response)
+                    return
+                status = getattr(getattr(exception, "resp", None), "status", 0)
+                if int(status or 0) in RETRYABLE_STATUSES and attempt < max_retries:
+                    metrics.incr("gmail.batch_item_retries")
+                    retry.append(request_id)
+                else:
+                    metrics.incr("gmail.batch_item_errors")
+                    print(f"Warning: could not get message {request_id}: {exception}")
+
+            batch = service.new_batch_http_request(callback=_callback)
+            params = {"userId": "me", "format": format}
+            if format == "metadata" and metadata_headers:
+                params["metadataHeaders"] = list(metadata_headers)
+            for mid in chunk:
+                batch.add(service.users().messages().get(id=mid, **params), request_id=mid)
+            _charge("messages.get", len(chunk))
+            batch.execute()
+            metrics.incr("gmail.batches")
+            metrics.incr(f"gmail.messages_{format}", len(received))
+            yield from received
+        if not retry:
+            break
+        attempt += 1
+        time.sleep(min(2 ** attempt, 32) + random.random())
+        pending = retry
+
+
 def get_body_from_message(msg: dict) -> str:
     """Extract plain or HTML body from Gmail message payload."""
     payload = msg.get("payload", {})
@@ -73,6 +263,9 @@ def get_headers_from_message(msg: dict) -> dict:
 
 def mark_as_read(service, message_id: str) -> None:
     """Remove UNREAD label from the message."""
+    from googleapiclient.errors import HttpError
+
+    _charge("messages.modify")
     try:
         service.users().messages().modify(
             userId="me",
@@ -84,6 +277,49 @@ def mark_as_read(service, message_id: str) -> None:
         print(f"Warning: could not mark {message_id} as read: {e}")
 
 
+def batch_modify(
+    service,
+    message_ids,
+    add_label_ids: list[str] | None = None,
+    remove_label_ids: list[str] | None = None,
+) -> list[str]:
+    """
+    Add/remove labels on many messages with users.messages.batchModify
+    (up to 1000 ids per call). Returns ids whose call failed; never raises HttpError.
+    """
+    from googleapiclient.errors import HttpError
+
+    ids = list(dict.fromkeys(m for m in message_ids if m))
+    body = {}
+    if add_label_ids:
+        body["addLabelIds"] = list(add_label_ids)
+    if remove_label_ids:
+        body["removeLabelIds"] = list(remove_label_ids)
+    if not ids or not body:
+        return []
+    failed: list[str] = []
+    for start in range(0, len(ids), BATCH_MODIFY_MAX_IDS):
+        chunk = ids[start:start + BATCH_MODIFY_MAX_IDS]
+        _charge("messages.batchModify")
+        try:
+            service.users().messages().batchModify(
+                userId="me",
+                body={"ids": chunk, **body},
+            ).execute()
+        except HttpError as e:
+            # Log but don't fail the pipeline
+            print(f"Warning: batchModify failed for {len(chunk)} messages: {e}")
+            failed.extend(chunk)
+            continue
+        metrics.incr("gmail.messages_modified", len(chunk))
+    return failed
+
+
+def mark_many_as_read(service, message_ids) -> list[str]:
+    """Remove UNREAD label from many messages. Returns ids that could not be updated."""
+    return batch_modify(service, message_ids, remove_label_ids=["UNREAD"])
+
+
 def send_email(service, to: str, subject: str, html_body: str, from_email: str | None = None) -> dict:
     """
     Send an email. Uses the authenticated user as sender.
@@ -94,11 +330,13 @@ def send_email(service, to: str, subject: str, html_body: str, from_email: str |
     message["Subject"] = subject
     # Plain text fallback: strip tags roughly
     import re
-    plain = re.sub(r"<[^>]+>", "", html_body)
+    plain = re.sub(r"<style[^>]*>.*?</style>", "", html_body, flags=re.S)
+    plain = re.sub(r"<[^>]+>", "", plain)
     message.attach(MIMEText(plain, "plain"))
     message.attach(MIMEText(html_body, "html"))
 
     raw = base64.urlsafe_b64encode(message.as_bytes()).decode("utf-8")
+    _charge("messages.send")
     return service.users().messages().send(userId="me", body={"raw": raw}).execute()
 
 
@@ -108,9 +346,17 @@ def build_client():
     return type("GmailClient", (), {
         "service": service,
         "list_message_ids": lambda q, max_results=500: list_message_ids(service, q, max_results),
+        "get_history_id": lambda: get_history_id(service),
+        "list_history_message_ids": lambda start: list_history_message_ids(service, start),
         "get_message": lambda mid: get_message(service, mid),
+        "get_messages": lambda ids, format="full": get_messages(service, ids, format=format),
+        "get_message_metadata": lambda ids: get_messages(
+            service, ids, format="metadata", metadata_headers=TRIAGE_HEADERS
+        ),
         "get_body": get_body_from_message,
         "get_headers": get_headers_from_message,
         "mark_as_read": lambda mid: mark_as_read(service, mid),
+        "mark_many_as_read": lambda ids: mark_many_as_read(service, ids),
+        "batch_modify": lambda ids, add=None, remove=None: batch_modify(service, ids, add, remove),
         "send_email": lambda to, subj, body: send_email(service, to, subj, body),
     })()
@@ -1,8 +1,16 @@
 """
 Heuristics to treat a message as a newsletter (and exclude non-newsletters).
+Mailing-list headers (List-Id, List-Unsubscribe, Precedence: bulk) are the main signal;
+From/Subject patterns are the fallback. SenderVerdicts remembers senders whose mail
+keeps failing the body checks so they are rejected before download.
 """
 
 import re
+import threading
+import time
+from email.utils import parseaddr
+
+import config
 
 # From-address substrings that suggest a newsletter
 NEWSLETTER_FROM_PATTERNS = (
@@ -44,6 +52,22 @@ EXCLUDE_FROM_PATTERNS = (
 )
 
 
+# Precedence values used by mailing lists and bulk senders
+BULK_PRECEDENCE = ("bulk", "list")
+
+
+def _any_re(patterns, words: bool = False) -> re.Pattern:
+    alternation = "|".join(re.escape(p) for p in patterns)
+    return re.compile(rf"\b(?:{alternation})\b" if words else alternation)
+
+
+# Compiled once; subject patterns match whole words ("daily" but not "dailymotion")
+_EXCLUDE_FROM_RE = _any_re(EXCLUDE_FROM_PATTERNS)
+_EXCLUDE_SUBJECT_RE = _any_re(EXCLUDE_SUBJECT_PATTERNS, words=True)
+_NEWSLETTER_FROM_RE = _any_re(NEWSLETTER_FROM_PATTERNS)
+_NEWSLETTER_SUBJECT_RE = _any_re(NEWSLETTER_SUBJECT_PATTERNS, words=True)
+
+
 def is_likely_newsletter(from_header: str, subject: str) -> bool:
     """
     Return True if the message looks like a newsletter.
@@ -51,14 +75,66 @@ def is_likely_newsletter(from_header: str, subject: str) -> bool:
     """
     from_lower = (from_header or "").lower()
     subject_lower = (subject or "").lower()
+    if _EXCLUDE_FROM_RE.search(from_lower) or _EXCLUDE_SUBJECT_RE.search(subject_lower):
+        return False
+    return bool(_NEWSLETTER_FROM_RE.search(from_lower) or _NEWSLETTER_SUBJECT_RE.search(subject_lower))
 
-    for pattern in EXCLUDE_FROM_PATTERNS:
-        if pattern in from_lower:
-            return False
-    for pattern in EXCLUDE_SUBJECT_PATTERNS:
-        if pattern in subject_lower:
+
+def is_newsletter(headers: dict) -> bool:
+    """
+    Classify on metadata headers (lowercased names, as from get_headers_from_message).
+    Exclusions lose; then List-Id / List-Unsubscribe / Precedence: bulk win; otherwise
+    fall back to is_likely_newsletter.
+    """
+    from_header = headers.get("from", "")
+    subject = headers.get("subject", "")
+    if _EXCLUDE_FROM_RE.search(from_header.lower()) or _EXCLUDE_SUBJECT_RE.search(subject.lower()):
+        return False
+    if headers.get("list-id") or headers.get("list-unsubscribe"):
+        return True
+    if headers.get("precedence", "").strip().lower() in BULK_PRECEDENCE:
+        return True
+    return is_likely_newsletter(from_header, subject)
+
+
+def sender_address(from_header: str) -> str:
+    """Lowercased email address of a From header ("" if none)."""
+    return parseaddr(from_header or "")[1].lower()
+
+
+class SenderVerdicts:
+    """
+    Per-sender outcome counts learned from past runs: how many messages passed or failed
+    the body checks (empty body, MIN_WORD_COUNT). A sender with reject_after failures and
+    no passes is blocked at triage; verdicts older than max_age_days expire so a sender
+    that starts sending real content gets another look. Thread-safe.
+    """
+
+    def __init__(
+        self,
+        stats: dict[str, tuple[int, int, float]] | None = None,
+        reject_after: int | None = None,
+        max_age_days: float | None = None,
+    ):
+        # sender -> (accepted, rejected, updated_at)
+        self.stats = dict(stats or {})
+        self.reject_after = config.SENDER_REJECT_AFTER if reject_after is None else reject_after
+        self.max_age_s = (config.SENDER_VERDICT_DAYS if max_age_days is None else max_age_days) * 86400
+        self._lock = threading.Lock()
+
+    def blocked(self, from_header: str) -> bool:
+        if self.reject_after <= 0:
             return False
+        with self._lock:
+            accepted, rejected, updated_at = self.stats.get(sender_address(from_header), (0, 0, 0.0))
+        return accepted == 0 and rejected >= self.reject_after and time.time() - updated_at < self.max_age_s
 
-    from_ok = any(p in from_lower for p in NEWSLETTER_FROM_PATTERNS)
-    subject_ok = any(p in subject_lower for p in NEWSLETTER_SUBJECT_PATTERNS)
-    return from_ok or subject_ok
+    def record(self, from_header: str, accepted: bool) -> str:
+        """Count one outcome for the sender; returns the sender address ("" if none)."""
+        sender = sender_address(from_header)
+        if not sender:
+            return ""
+        with self._lock:
+            a, r, _ = self.stats.get(sender, (0, 0, 0.0))
+            self.stats[sender] = (a + 1, r, time.time()) if accepted else (a, r + 1, time.time())
+        return sender
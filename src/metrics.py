@@ -0,0 +1,149 @@
+"""
+Run instrumentation: per-stage wall/CPU time, counters and latency histograms.
+One process-wide registry (thread-safe); run() resets it, writes the JSON run report
+next to the digest and passes the report to any registered hooks (e.g. monitoring).
+"""
+
+import importlib
+import json
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+# Histogram bucket upper bounds in milliseconds (last bucket is +inf)
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 15000)
+
+_lock = threading.Lock()
+_stages: dict[str, dict] = {}
+_counters: dict[str, float] = {}
+_histograms: dict[str, dict] = {}
+_hooks: list[Callable[[dict], None]] = []
+_started = time.time()
+
+
+def reset() -> None:
+    """Clear all recorded metrics (hooks stay registered)."""
+    global _started
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+        _histograms.clear()
+        _started = time.time()
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Time a block as stage `name`. Re-entering the same stage accumulates.
+    CPU time is process-wide, so it includes worker threads started by the stage.
+    """
+    wall0 = time.perf_counter()
+    cpu0 = time.process_time()
+    try:
+        yield
+    finally:
+        _add_stage(name, time.perf_counter() - wall0, time.process_time() - cpu0)
+
+
+def timed_iter(name: str, iterable: Iterable) -> Iterator:
+    """Yield from iterable, charging only the time spent waiting on it to stage `name`."""
+    it = iter(iterable)
+    while True:
+        wall0 = time.perf_counter()
+        cpu0 = time.process_time()
+        try:
+            value = next(it)
+        except StopIteration:
+            _add_stage(name, time.perf_counter() - wall0, time.process_time() - cpu0)
+            return
+        _add_stage(name, time.perf_counter() - wall0, time.process_time() - cpu0)
+        yield value
+
+
+def _add_stage(name: str, wall: float, cpu: float) -> None:
+    with _lock:
+        s = _stages.setdefault(name, {"wall_s": 0.0, "cpu_s": 0.0, "calls": 0})
+        s["wall_s"] += wall
+        s["cpu_s"] += cpu
+        s["calls"] += 1
+
+
+def incr(name: str, value: float = 1) -> None:
+    """Add value to counter `name` (e.g. "gmail.bytes", "dropped.not_newsletter")."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe_ms(name: str, value_ms: float) -> None:
+    """Record a latency sample (milliseconds) in histogram `name`."""
+    with _lock:
+        h = _histograms.get(name)
+        if h is None:
+            h = _histograms[name] = {
+                "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                "count": 0,
+                "sum_ms": 0.0,
+                "max_ms": 0.0,
+            }
+        h["buckets"][bisect_left(LATENCY_BUCKETS_MS, value_ms)] += 1
+        h["count"] += 1
+        h["sum_ms"] += value_ms
+        h["max_ms"] = max(h["max_ms"], value_ms)
+
+
+def snapshot() -> dict:
+    """Return the current metrics as a JSON-serializable dict."""
+    with _lock:
+        return {
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(_started)),
+            "duration_s": round(time.time() - _started, 3),
+            "stages": {
+                k: {"wall_s": round(v["wall_s"], 4), "cpu_s": round(v["cpu_s"], 4), "calls": v["calls"]}
+                for k, v in _stages.items()
+            },
+            "counters": dict(sorted(_counters.items())),
+            "histograms": {
+                k: {
+                    "bucket_bounds_ms": list(LATENCY_BUCKETS_MS) + ["inf"],
+                    "buckets": list(v["buckets"]),
+                    "count": v["count"],
+                    "mean_ms": round(v["sum_ms"] / v["count"], 2) if v["count"] else 0.0,
+                    "max_ms": round(v["max_ms"], 2),
+                }
+                for k, v in sorted(_histograms.items())
+            },
+        }
+
+
+def add_hook(hook: Callable[[dict], None]) -> None:
+    """
+    Register a callable that receives the final run report (to forward to monitoring).
+    A hook already registered is not added again, so each report reaches it once.
+    """
+    with _lock:
+        if hook not in _hooks:
+            _hooks.append(hook)
+
+
+def load_hook(spec: str) -> None:
+    """Register a hook given as "package.module:function" (e.g. from config.METRICS_HOOK)."""
+    module_name, _, attr = spec.partition(":")
+    add_hook(getattr(importlib.import_module(module_name), attr or "send_metrics"))
+
+
+def write_report(path: Path | str, extra: dict | None = None) -> dict:
+    """Write snapshot (plus extra fields) as JSON to path, then call hooks. Returns the report."""
+    report = {**(extra or {}), **snapshot()}
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    for hook in list(_hooks):
+        try:
+            hook(report)
+        except Exception as e:
+            # Monitoring must not fail the pipeline
+            print(f"Warning: metrics hook {getattr(hook, '__name__', hook)} failed: {e}")
+    return report
@@ -0,0 +1,48 @@
+"""
+Backfill planning: split a long lookback window into date shards that can be listed and
+downloaded in parallel. Each shard is a Gmail query bounded by after:/before: (after is
+inclusive, before exclusive, both whole days), so shards never overlap and together cover
+the run date and the days_back days before it. (Gmail reads those dates at midnight
+Pacific time; the shards still tile the window exactly.)
+"""
+
+from datetime import date, datetime, timedelta
+from typing import NamedTuple
+
+from src.gmail.client import DEFAULT_QUERY
+
+
+class Shard(NamedTuple):
+    after: date   # first day in the shard
+    before: date  # day after the last one
+
+    @property
+    def query(self) -> str:
+        return f"{DEFAULT_QUERY} after:{self.after:%Y/%m/%d} before:{self.before:%Y/%m/%d}"
+
+    @property
+    def days(self) -> int:
+        return (self.before - self.after).days
+
+
+def plan_shards(run_date: date, days_back: int, shard_days: int) -> list[Shard]:
+    """Shards of at most shard_days days covering run_date - days_back .. run_date, newest first."""
+    shard_days = max(1, shard_days)
+    start = run_date - timedelta(days=max(0, days_back))
+    shards = []
+    before = run_date + timedelta(days=1)
+    while before > start:
+        after = max(start, before - timedelta(days=shard_days))
+        shards.append(Shard(after, before))
+        before = after
+    return shards
+
+
+def message_day(received_ms: int, default: date) -> date:
+    """Local calendar day of a Gmail internalDate (ms since the epoch), or default if unknown."""
+    if not received_ms:
+        return default
+    try:
+        return datetime.fromtimestamp(received_ms / 1000).date()
+    except (OverflowError, OSError, ValueError):
+        return default
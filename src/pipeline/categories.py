@@ -1,12 +1,29 @@
 """
 Load MECE categories from data/mece-categories.json and assign items to one category each.
-Uses simple keyword matching per category definition/name; can be extended with LLM.
+Batches are scored with TF-IDF (TfidfCategorizer): item vectors are compared with category
+centroids built from each category's name, definition and optional "examples", in one
+sparse-dense product with NumPy. Term weights come from the category documents, not the
+batch, so an item gets the same category whatever else is categorized with it.
+Without NumPy, whole-word keyword matching through a precomputed inverted index
+(CategoryMatcher) is used instead. Can be extended with LLM.
 """
 
+import importlib.util
 import json
+import math
+import re
+from collections import Counter
+from itertools import chain
 from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
 
 import config
+from src.pipeline.items import Item
+
+# NumPy is imported on first use, so runs that never categorize don't pay for it
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+if TYPE_CHECKING:
+    import numpy as np
 
 
 def load_categories() -> list[dict]:
@@ -23,50 +40,178 @@ def load_categories() -> list[dict]:
     return data.get("categories", data.get("items", []))
 
 
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:['’][a-z]+)?")
+
+
+def _tokens(text: str) -> list[str]:
+    """Lowercased word tokens; matching on whole tokens gives word-boundary semantics."""
+    return _TOKEN_RE.findall(text.lower())
+
+
 def _keywords_for_category(cat: dict) -> set[str]:
-    name = (cat.get("name") or "").lower()
-    definition = (cat.get("definition") or "").lower()
-    # Use first 2-3 words of name and words from definition (min length 4)
-    words = set()
-    for part in name.replace("&", " ").split():
-        if len(part) >= 2:
-            words.add(part)
-    for part in definition.replace(",", " ").replace(".", " ").split():
-        if len(part) >= 4:
-            words.add(part)
+    name = cat.get("name") or ""
+    definition = cat.get("definition") or ""
+    # Use words of name (min length 2) and words from definition (min length 4)
+    words = {w for w in _tokens(name) if len(w) >= 2}
+    words.update(w for w in _tokens(definition) if len(w) >= 4)
     return words
 
 
-def assign_category(item: dict, categories: list[dict]) -> str:
+class CategoryMatcher:
+    """
+    Categorizer compiled once from a category list.
+    Holds an inverted keyword -> category index so each item is scored in a
+    single pass over its distinct tokens, independent of the number of categories.
+    """
+
+    def __init__(self, categories: list[dict]):
+        self.names: list[str] = []
+        self.index: dict[str, list[int]] = {}
+        for cat in categories:
+            name = cat.get("name", "Other")
+            if name == "Other":
+                continue
+            idx = len(self.names)
+            self.names.append(name)
+            for kw in _keywords_for_category(cat):
+                self.index.setdefault(kw, []).append(idx)
+
+    def assign(self, item: Item) -> str:
+        """Return the best-scoring category name for item's title/snippet, or "Other"."""
+        text = item.title + " " + item.snippet
+        scores: dict[int, int] = {}
+        for tok in set(_tokens(text)):
+            for idx in self.index.get(tok, ()):
+                scores[idx] = scores.get(idx, 0) + 1
+        if not scores:
+            return "Other"
+        # Highest score wins; ties go to the earlier category in file order
+        idx = min(scores, key=lambda i: (-scores[i], i))
+        return self.names[idx]
+
+
+def assign_category(item: Item, categories: list[dict]) -> str:
     """
     Assign one category name to the item based on title/snippet text.
     Returns category name; falls back to "Other" if no match.
+    For many items, build a CategoryMatcher once instead.
+    """
+    return CategoryMatcher(categories).assign(item)
+
+
+def _category_tokens(cat: dict) -> list[str]:
+    """Tokens of a category's name, definition and labeled examples (short words dropped)."""
+    tokens = [w for w in _tokens(cat.get("name") or "") if len(w) >= 2]
+    tokens += [w for w in _tokens(cat.get("definition") or "") if len(w) >= 4]
+    for example in cat.get("examples") or []:
+        tokens += [w for w in _tokens(example) if len(w) >= 4]
+    return tokens
+
+
+class TfidfMatrix(NamedTuple):
+    """Sparse TF-IDF matrix as coordinate arrays; rows are L2-normalized and sorted by row."""
+
+    n_items: int
+    vocab: dict[str, int]
+    idf: "np.ndarray"
+    rows: "np.ndarray"
+    cols: "np.ndarray"
+    vals: "np.ndarray"
+
+
+class TfidfCategorizer:
     """
-    text = ((item.get("title") or "") + " " + (item.get("snippet") or "")).lower()
-    if not text:
-        return "Other"
-
-    best = "Other"
-    best_score = 0
-    for cat in categories:
-        if cat.get("name") == "Other":
-            continue
-        kw = _keywords_for_category(cat)
-        score = sum(1 for w in kw if w in text)
-        if score > best_score:
-            best_score = score
-            best = cat.get("name", "Other")
-
-    return best
-
-
-def categorize_items(items: list[dict], categories: list[dict] | None = None) -> list[dict]:
-    """Add "category" key to each item. Returns new list (items are shallow copies)."""
+    Batch categorizer. vectorize() builds a sparse TF-IDF matrix over the items' title and
+    snippet (sublinear tf, L2-normalized rows); assign() scores it against the normalized
+    category centroids in one sparse-dense product and takes the argmax. Idf is the smoothed
+    idf over the category documents (terms no category uses get the highest weight), fixed
+    when the categorizer is built. Items whose best cosine score is under min_score
+    (default config.CATEGORY_MIN_SCORE) go to "Other". Requires NumPy.
+    """
+
+    def __init__(self, categories: list[dict], min_score: float | None = None):
+        self.min_score = config.CATEGORY_MIN_SCORE if min_score is None else min_score
+        self.names: list[str] = []
+        docs: list[Counter] = []
+        for cat in categories:
+            name = cat.get("name", "Other")
+            if name == "Other":
+                continue
+            self.names.append(name)
+            docs.append(Counter(_category_tokens(cat)))
+        df = Counter(chain.from_iterable(docs))
+        self._unseen_idf = math.log(1 + len(docs)) + 1.0
+        self._idf = {t: math.log((1 + len(docs)) / (1 + n)) + 1.0 for t, n in df.items()}
+        # Dense unit-length centroids over category terms (rows) for each category (columns)
+        self._terms = {t: i for i, t in enumerate(df)}
+        self._centroids: list[list[float]] = [[0.0] * len(docs) for _ in self._terms]
+        for c, doc in enumerate(docs):
+            norm = math.sqrt(sum(((1.0 + math.log(n)) * self._idf[t]) ** 2 for t, n in doc.items())) or 1.0
+            for t, n in doc.items():
+                self._centroids[self._terms[t]][c] = (1.0 + math.log(n)) * self._idf[t] / norm
+
+    def assign_all(self, items: list[Item]) -> list[str]:
+        """Category name for each item, in order."""
+        if not items or not self.names:
+            return ["Other"] * len(items)
+        return self.assign(self.vectorize(items))
+
+    def vectorize(self, items: list[Item]) -> TfidfMatrix:
+        """TF-IDF matrix of the items' title + snippet (tokenizing dominates the cost)."""
+        import numpy as np
+
+        n_items = len(items)
+        docs = [_tokens(it.title + " " + it.snippet) for it in items]
+        flat = list(chain.from_iterable(docs))
+        vocab = {t: i for i, t in enumerate(dict.fromkeys(flat))}
+        n_terms = len(vocab)
+        cols = np.fromiter(map(vocab.__getitem__, flat), dtype=np.int64, count=len(flat))
+        rows = np.repeat(np.arange(n_items, dtype=np.int64), [len(d) for d in docs])
+
+        # Term counts per (item, term): the nonzeros of the sparse matrix, sorted by row
+        keys, counts = np.unique(rows * n_terms + cols, return_counts=True)
+        rows, cols = keys // n_terms, keys % n_terms
+        idf = np.fromiter((self._idf.get(t, self._unseen_idf) for t in vocab), dtype=np.float64, count=n_terms)
+        vals = (1.0 + np.log(counts)) * idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=vals * vals, minlength=n_items))
+        vals /= np.where(norms > 0, norms, 1.0)[rows]
+        return TfidfMatrix(n_items, vocab, idf, rows, cols, vals)
+
+    def assign(self, m: TfidfMatrix) -> list[str]:
+        """Category name for each row of m: argmax of cosine scores, "Other" under min_score."""
+        import numpy as np
+
+        n_items, vocab, idf, rows, cols, vals = m
+        # Category terms only; other terms score zero
+        centroids = np.array(self._centroids, dtype=np.float64).reshape(len(self._terms), len(self.names))
+        pos = np.full(len(vocab), -1, dtype=np.int64)
+        for tok, i in self._terms.items():
+            if tok in vocab:
+                pos[vocab[tok]] = i
+
+        # Sparse (items x terms) @ dense (terms x categories), reduced over each row's run
+        hit = pos[cols] >= 0
+        rows, contrib = rows[hit], vals[hit, None] * centroids[pos[cols[hit]]]
+        scores = np.zeros((n_items, len(self.names)))
+        if len(rows):
+            starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+            scores[rows[starts]] = np.add.reduceat(contrib, starts, axis=0)
+        # Rounded so exact ties go to the earlier category whatever the summation order
+        scores = scores.round(9)
+        best = scores.argmax(axis=1)
+        confident = scores[np.arange(n_items), best] >= self.min_score
+        return [self.names[b] if ok else "Other" for b, ok in zip(best.tolist(), confident.tolist())]
+
+
+def categorize_items(items: list[Item], categories: list[dict] | None = None) -> list[Item]:
+    """Set each item's category in place (TF-IDF with NumPy, keywords without). Returns items."""
     if categories is None:
         categories = load_categories()
-    out = []
+    if HAS_NUMPY:
+        for it, name in zip(items, TfidfCategorizer(categories).assign_all(items)):
+            it.category = name
+        return items
+    matcher = CategoryMatcher(categories)
     for it in items:
-        copy = dict(it)
-        copy["category"] = assign_category(it, categories)
-        out.append(copy)
-    return out
+        it.category = matcher.assign(it)
+    return items
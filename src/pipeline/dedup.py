@@ -1,9 +1,22 @@
 """
 In-memory deduplication: merge items that refer to the same story (same URL or very similar title).
+Near-duplicates are found with MinHash signatures over title+snippet word shingles and LSH
+banding, so only items sharing a band bucket are compared instead of every pair.
 """
 
+import hashlib
 import re
-from collections import defaultdict
+
+import config
+from src.fetcher.canonical import canonical_url
+from src.pipeline.items import Item
+
+# MinHash parameters: signature length, shingle width (words), text budget for shingling
+NUM_PERM = 64
+SHINGLE_SIZE = 3
+SHINGLE_TEXT_CHARS = 300
+_BIN_BITS = NUM_PERM.bit_length() - 1  # NUM_PERM must be a power of two
+_EMPTY = 1 << 64
 
 
 def normalize_title(s: str) -> str:
@@ -15,69 +28,151 @@ def normalize_title(s: str) -> str:
 
 
 def normalize_url(url: str) -> str:
-    """Strip query and fragment for dedup."""
+    """Canonical URL for dedup (see src.fetcher.canonical)."""
     if not url:
         return ""
-    return url.split("?")[0].split("#")[0].rstrip("/")
+    # Trailing slash is usually insignificant for identity, though it can matter when fetching
+    return (canonical_url(url) or url).rstrip("/")
+
+
+def merge_items(items: list[Item], threshold: float | None = None) -> list[Item]:
+    """
+    Merge duplicate items: same normalized URL, or title+snippet shingle similarity
+    (estimated Jaccard) >= threshold (default config.DEDUP_SIMILARITY).
+    The first item of each story is kept and absorbs the newsletters and message ids
+    of its duplicates. Items without URL (e.g. newsletter body) are kept as-is.
+    """
+    deduper = Deduper(threshold)
+    for it in items:
+        deduper.add(it)
+    return deduper.merged()
+
+
+class Deduper:
+    """
+    Incremental form of merge_items: add() items as they arrive (e.g. from a streaming
+    pipeline), then merged() once. Each new URL is compared only with earlier items that
+    share an LSH band bucket, so total work stays close to linear in the number of items.
+    """
 
+    def __init__(self, threshold: float | None = None):
+        self.threshold = config.DEDUP_SIMILARITY if threshold is None else threshold
+        self._bands, self._rows = _lsh_bands(self.threshold) if self.threshold <= 1 else (0, 0)
+        self._buckets: list[dict[tuple[int, ...], list[int]]] = [{} for _ in range(self._bands)]
+        self._groups: list[list[Item]] = []  # items per normalized URL, in first-seen order
+        self._by_url: dict[str, int] = {}
+        self._shingles: list[set[int]] = []
+        self._parent: list[int] = []
+        self._without_url: list[Item] = []
 
-def merge_items(items: list[dict]) -> list[dict]:
+    def __len__(self) -> int:
+        return sum(len(g) for g in self._groups) + len(self._without_url)
+
+    def _find(self, i: int) -> int:
+        parent = self._parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def add(self, it: Item) -> None:
+        nurl = normalize_url(it.url)
+        if not nurl:
+            self._without_url.append(it)
+            return
+        gi = self._by_url.get(nurl)
+        if gi is not None:
+            self._groups[gi].append(it)
+            return
+        gi = len(self._groups)
+        self._groups.append([it])
+        self._by_url[nurl] = gi
+        self._parent.append(gi)
+        shingles = _shingles(it) if self._bands else set()
+        self._shingles.append(shingles)
+        if not shingles:
+            return
+        sig = _minhash(shingles)
+        checked: set[int] = set()
+        for band, buckets in enumerate(self._buckets):
+            lo = band * self._rows
+            members = buckets.setdefault(sig[lo:lo + self._rows], [])
+            for j in members:
+                if j in checked:
+                    continue
+                checked.add(j)
+                ri, rj = self._find(gi), self._find(j)
+                if ri == rj:
+                    continue
+                # Verify candidates with exact Jaccard to drop LSH false positives
+                other = self._shingles[j]
+                if len(shingles & other) / len(shingles | other) >= self.threshold:
+                    self._parent[max(ri, rj)] = min(ri, rj)
+            members.append(gi)
+
+    def merged(self) -> list[Item]:
+        """
+        One item per story: URL clusters in first-seen order, then items without URL.
+        Each cluster's first item absorbs the rest in place; call once.
+        """
+        clusters: dict[int, list[int]] = {}
+        for i in range(len(self._groups)):
+            clusters.setdefault(self._find(i), []).append(i)
+        result: list[Item] = []
+        for cluster in sorted(clusters.values(), key=lambda c: c[0]):
+            group = [it for gi in cluster for it in self._groups[gi]]
+            first = group[0]
+            for dup in group[1:]:
+                first.absorb(dup)
+            result.append(first)
+        result.extend(self._without_url)
+        return result
+
+
+def _shingles(it: Item) -> set[int]:
+    """64-bit hashed word shingles of normalized title + start of snippet."""
+    text = normalize_title(it.title) + " " + normalize_title(it.snippet[:SHINGLE_TEXT_CHARS])
+    words = text.split()
+    if len(words) < SHINGLE_SIZE:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    # blake2b rather than hash(): stable across processes, so runs merge identically
+    return {int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "big") for g in grams}
+
+
+def _minhash(shingles: set[int]) -> tuple[int, ...]:
     """
-    Take a list of items (each with url, title, newsletter_name, snippet, etc.)
-    and merge duplicates: same normalized URL or same normalized title.
-    Merged item keeps one url/title, concatenates newsletter_name and sources.
-    Items without URL (e.g. newsletter body) are kept as-is.
+    One-permutation MinHash: each shingle hash is hashed once into one of NUM_PERM bins
+    (low bits) and each bin keeps its minimum, so cost is O(shingles) rather than
+    O(shingles * NUM_PERM). Empty bins borrow the next non-empty bin (rotation densification).
     """
-    with_url = [it for it in items if normalize_url(it.get("url") or "")]
-    without_url = [it for it in items if not normalize_url(it.get("url") or "")]
-
-    by_url: dict[str, list[dict]] = defaultdict(list)
-    for it in with_url:
-        nurl = normalize_url(it.get("url") or "")
-        if nurl:
-            by_url[nurl].append(it)
-
-    result: list[dict] = []
-    for nurl, group in by_url.items():
-        if len(group) == 1:
-            result.append(_single_to_merged(group[0]))
-        else:
-            result.append(_merge_group(group))
-
-    for it in without_url:
-        result.append(_single_to_merged(it))
-
-    return result
-
-
-def _single_to_merged(it: dict) -> dict:
-    newsletters = it.get("newsletter_names") or [it.get("newsletter_name") or it.get("newsletter") or "Unknown"]
-    if isinstance(newsletters, str):
-        newsletters = [newsletters]
-    return {
-        "url": it.get("url"),
-        "title": it.get("title") or it.get("snippet", "")[:200],
-        "snippet": it.get("snippet") or it.get("text", "")[:500],
-        "newsletter_names": newsletters,
-        "message_ids": [it.get("message_id")] if it.get("message_id") else [],
-    }
-
-
-def _merge_group(group: list[dict]) -> dict:
-    first = group[0]
-    collected = []
-    for x in group:
-        names = x.get("newsletter_names")
-        if isinstance(names, list):
-            collected.extend(names)
-        else:
-            collected.append(x.get("newsletter_name") or x.get("newsletter") or "Unknown")
-    newsletters = list(dict.fromkeys(collected))
-    message_ids = list({x.get("message_id") for x in group if x.get("message_id")})
-    return {
-        "url": first.get("url"),
-        "title": first.get("title") or first.get("snippet", "")[:200],
-        "snippet": first.get("snippet") or first.get("text", "")[:500],
-        "newsletter_names": newsletters,
-        "message_ids": message_ids,
-    }
+    sig = [_EMPTY] * NUM_PERM
+    for h in shingles:
+        b = h & (NUM_PERM - 1)
+        v = h >> _BIN_BITS
+        if v < sig[b]:
+            sig[b] = v
+    for i in range(NUM_PERM):
+        if sig[i] == _EMPTY:
+            for step in range(1, NUM_PERM):
+                v = sig[(i + step) % NUM_PERM]
+                if v < _EMPTY:
+                    sig[i] = _EMPTY + step + (v << 7)  # distance offset keeps borrowed values distinct
+                    break
+    return tuple(sig)
+
+
+def _lsh_bands(threshold: float) -> tuple[int, int]:
+    """Pick (bands, rows) with bands*rows == NUM_PERM whose S-curve midpoint is closest to threshold."""
+    best = (NUM_PERM, 1)
+    best_err = float("inf")
+    for rows in range(1, NUM_PERM + 1):
+        if NUM_PERM % rows:
+            continue
+        bands = NUM_PERM // rows
+        err = abs((1 / bands) ** (1 / rows) - threshold)
+        if err < best_err:
+            best, best_err = (bands, rows), err
+    return best
+
@@ -0,0 +1,47 @@
+"""
+Digest item model shared by the run, dedup, categorization and the digest generator.
+One Item is built per newsletter body or fetched article and later stages annotate it in
+place (dedup folds duplicates into the first item of a story, categorization sets its
+category) instead of copying it. __slots__ keeps each item small on 10k+ item backfills,
+and only the snippet of a body or article is ever stored.
+"""
+
+
+class Item:
+    """A story in the digest: title, link, snippet and the newsletters that cited it."""
+
+    __slots__ = ("title", "url", "snippet", "newsletter_names", "message_ids", "category", "day")
+
+    def __init__(
+        self,
+        title: str = "",
+        url: str = "",
+        snippet: str = "",
+        newsletter_names: list[str] | None = None,
+        message_ids: list[str] | None = None,
+        category: str = "",
+        day: str = "",
+    ):
+        self.title = title or snippet[:200]
+        self.url = url
+        self.snippet = snippet
+        # May be a list shared with the caller (e.g. live link citations); never mutated here
+        self.newsletter_names = newsletter_names if newsletter_names is not None else []
+        self.message_ids = message_ids if message_ids is not None else []
+        self.category = category
+        # ISO date the story first arrived (per-day digests); "" if unknown
+        self.day = day
+
+    @property
+    def newsletter_name(self) -> str:
+        return self.newsletter_names[0] if self.newsletter_names else "Unknown"
+
+    def absorb(self, other: "Item") -> None:
+        """Fold a duplicate of this story in: its newsletters and messages are credited here."""
+        self.newsletter_names = list(dict.fromkeys(self.newsletter_names + other.newsletter_names))
+        self.message_ids = list(dict.fromkeys(self.message_ids + other.message_ids))
+        if other.day and (not self.day or other.day < self.day):
+            self.day = other.day
+
+    def __repr__(self) -> str:
+        return f"Item(title={self.title!r}, url={self.url!r}, category={self.category!r})"
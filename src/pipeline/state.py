@@ -0,0 +1,297 @@
+"""
+Local SQLite state store: per-run progress of each message and URL, so an interrupted
+run can be resumed (python -m src.run --resume) without re-downloading, re-parsing or
+re-fetching completed work, and without sending the digest or marking messages twice.
+It also keeps what later runs build on: the Gmail historyId that the next incremental
+sync starts from, per-sender triage verdicts, per-domain fetch outcomes and the links
+recent digests already covered (both used by the link scheduler).
+"""
+
+import json
+import sqlite3
+import time
+from pathlib import Path
+
+import config
+
+# Message progress, in order
+MSG_LISTED = "listed"
+MSG_SKIPPED = "skipped"  # not a newsletter, empty or too short
+MSG_EXTRACTED = "extracted"
+MSG_DIGESTED = "digested"
+MSG_MARKED_READ = "marked_read"
+
+# URL progress
+URL_LISTED = "listed"
+URL_FETCHED = "fetched"
+URL_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    digest_path TEXT,
+    sent_at REAL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    run_id TEXT NOT NULL,
+    message_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    record TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, message_id)
+);
+CREATE TABLE IF NOT EXISTS sync (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS senders (
+    sender TEXT PRIMARY KEY,
+    accepted INTEGER NOT NULL,
+    rejected INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS domains (
+    domain TEXT PRIMARY KEY,
+    fetched INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS digested_urls (
+    url TEXT PRIMARY KEY,
+    digested_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sent_parts (
+    run_id TEXT NOT NULL,
+    part TEXT NOT NULL,
+    sent_at REAL NOT NULL,
+    PRIMARY KEY (run_id, part)
+);
+CREATE TABLE IF NOT EXISTS urls (
+    run_id TEXT NOT NULL,
+    url TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, url)
+);
+"""
+
+
+class StateStore:
+    """Checkpoints for one pipeline run. Use from a single thread."""
+
+    def __init__(self, path: Path | str | None = None):
+        self.path = Path(path or config.STATE_DB_PATH)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self.run_id = ""
+        # Whether begin_run continued an unfinished run
+        self.resumed = False
+
+    def begin_run(self, resume: bool = False) -> str:
+        """
+        Start a run. With resume, continue the most recent unfinished run if any.
+        Otherwise start fresh and drop checkpoints of older runs. self.resumed tells which.
+        """
+        self.resumed = False
+        if resume:
+            row = self.conn.execute(
+                "SELECT run_id FROM runs WHERE finished_at IS NULL ORDER BY started_at DESC LIMIT 1"
+            ).fetchone()
+            if row:
+                self.run_id = row[0]
+                self.resumed = True
+                return self.run_id
+        now = time.time()
+        self.run_id = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+        with self.conn:
+            self.conn.execute("DELETE FROM messages")
+            self.conn.execute("DELETE FROM urls")
+            self.conn.execute("DELETE FROM sent_parts")
+            self.conn.execute("DELETE FROM runs")
+            self.conn.execute("INSERT INTO runs (run_id, started_at) VALUES (?, ?)", (self.run_id, now))
+        return self.run_id
+
+    def finish_run(self, history_id: str = "", unfinished_ids=()) -> None:
+        """
+        Mark the run finished. history_id (if given) is where the next incremental sync
+        starts; it is saved with unfinished_ids, the messages this run listed but did not
+        consume, which that sync lists again since the history will not return them.
+        """
+        with self.conn:
+            self.conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), self.run_id))
+            if history_id:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO sync (key, value) VALUES (?, ?)",
+                    [("history_id", history_id), ("unfinished_ids", json.dumps(list(unfinished_ids)))],
+                )
+
+    def history_id(self) -> str:
+        """Gmail historyId saved by the last finished run ("" if none). Kept across runs."""
+        row = self.conn.execute("SELECT value FROM sync WHERE key = 'history_id'").fetchone()
+        return row[0] if row else ""
+
+    def unfinished_ids(self) -> list[str]:
+        """Messages left unconsumed when history_id() was saved. Kept across runs."""
+        row = self.conn.execute("SELECT value FROM sync WHERE key = 'unfinished_ids'").fetchone()
+        return json.loads(row[0]) if row else []
+
+    def unconsumed_messages(self) -> list[str]:
+        """Messages of this run neither skipped nor marked read, in listing order."""
+        rows = self.conn.execute(
+            "SELECT message_id FROM messages WHERE run_id = ? AND status NOT IN (?, ?) ORDER BY rowid",
+            (self.run_id, MSG_SKIPPED, MSG_MARKED_READ),
+        )
+        return [r[0] for r in rows.fetchall()]
+
+    # Messages
+
+    def add_messages(self, message_ids) -> None:
+        """Record ids as listed; ids already checkpointed keep their status."""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO messages (run_id, message_id, status, updated_at) VALUES (?, ?, ?, ?)",
+                [(self.run_id, mid, MSG_LISTED, now) for mid in message_ids],
+            )
+
+    def set_message(self, message_id: str, status: str, record: dict | None = None) -> None:
+        with self.conn:
+            if record is None:
+                self.conn.execute(
+                    "UPDATE messages SET status = ?, updated_at = ? WHERE run_id = ? AND message_id = ?",
+                    (status, time.time(), self.run_id, message_id),
+                )
+            else:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO messages (run_id, message_id, status, record, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (self.run_id, message_id, status, json.dumps(record), time.time()),
+                )
+
+    def set_messages(self, message_ids, status: str) -> None:
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE messages SET status = ?, updated_at = ? WHERE run_id = ? AND message_id = ?",
+                [(status, now, self.run_id, mid) for mid in message_ids],
+            )
+
+    def message_statuses(self) -> dict[str, str]:
+        rows = self.conn.execute(
+            "SELECT message_id, status FROM messages WHERE run_id = ?", (self.run_id,)
+        )
+        return dict(rows.fetchall())
+
+    def newsletters(self) -> list[dict]:
+        """Newsletter records checkpointed at the extracted stage or later, in insertion order."""
+        rows = self.conn.execute(
+            "SELECT record FROM messages WHERE run_id = ? AND record IS NOT NULL ORDER BY rowid",
+            (self.run_id,),
+        )
+        return [json.loads(r[0]) for r in rows.fetchall()]
+
+    # Senders (kept across runs)
+
+    def sender_stats(self) -> dict[str, tuple[int, int, float]]:
+        """sender -> (accepted, rejected, updated_at), for filters.SenderVerdicts."""
+        rows = self.conn.execute("SELECT sender, accepted, rejected, updated_at FROM senders")
+        return {sender: (a, r, t) for sender, a, r, t in rows.fetchall()}
+
+    def set_sender(self, sender: str, stats: tuple[int, int, float]) -> None:
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO senders VALUES (?, ?, ?, ?)", (sender, *stats))
+
+    # Link history (kept across runs)
+
+    def domain_stats(self) -> dict[str, tuple[int, int]]:
+        """domain -> (fetched, failed) over past runs, for schedule.LinkScheduler."""
+        rows = self.conn.execute("SELECT domain, fetched, failed FROM domains")
+        return {domain: (ok, failed) for domain, ok, failed in rows.fetchall()}
+
+    def record_fetch(self, domain: str, ok: bool) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO domains (domain, fetched, failed, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(domain) DO UPDATE SET fetched = fetched + excluded.fetched, "
+                "failed = failed + excluded.failed, updated_at = excluded.updated_at",
+                (domain, int(ok), int(not ok), time.time()),
+            )
+
+    def digested_urls(self, max_age_days: float | None = None) -> set[str]:
+        """URLs included in a digest within the last max_age_days (default config.DIGESTED_URL_DAYS)."""
+        days = config.DIGESTED_URL_DAYS if max_age_days is None else max_age_days
+        cutoff = time.time() - days * 86400
+        with self.conn:
+            self.conn.execute("DELETE FROM digested_urls WHERE digested_at < ?", (cutoff,))
+        rows = self.conn.execute("SELECT url FROM digested_urls")
+        return {r[0] for r in rows.fetchall()}
+
+    def add_digested_urls(self, urls) -> None:
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO digested_urls (url, digested_at) VALUES (?, ?)",
+                [(url, now) for url in urls],
+            )
+
+    # URLs
+
+    def add_urls(self, urls) -> None:
+        now = time.time()
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO urls (run_id, url, status, updated_at) VALUES (?, ?, ?, ?)",
+                [(self.run_id, url, URL_LISTED, now) for url in urls],
+            )
+
+    def set_url(self, url: str, status: str, result: dict | None = None) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO urls (run_id, url, status, result, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (self.run_id, url, status, json.dumps(result) if result is not None else None, time.time()),
+            )
+
+    def url_results(self) -> dict[str, dict | None]:
+        """url -> stored fetch result for URLs that were fetched or failed in this run."""
+        rows = self.conn.execute(
+            "SELECT url, status, result FROM urls WHERE run_id = ? AND status != ?",
+            (self.run_id, URL_LISTED),
+        )
+        return {url: (json.loads(result) if result else None) for url, status, result in rows.fetchall()}
+
+    # Digest
+
+    def digest_sent(self) -> bool:
+        row = self.conn.execute("SELECT sent_at FROM runs WHERE run_id = ?", (self.run_id,)).fetchone()
+        return bool(row and row[0])
+
+    def sent_parts(self) -> set[str]:
+        """Digest files (one per day or part) already emailed by this run."""
+        rows = self.conn.execute("SELECT part FROM sent_parts WHERE run_id = ?", (self.run_id,))
+        return {r[0] for r in rows.fetchall()}
+
+    def set_part_sent(self, part: str) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO sent_parts (run_id, part, sent_at) VALUES (?, ?, ?)",
+                (self.run_id, part, time.time()),
+            )
+
+    def set_digest(self, digest_path: str, sent: bool = False) -> None:
+        with self.conn:
+            if sent:
+                self.conn.execute(
+                    "UPDATE runs SET digest_path = ?, sent_at = ? WHERE run_id = ?",
+                    (digest_path, time.time(), self.run_id),
+                )
+            else:
+                self.conn.execute(
+                    "UPDATE runs SET digest_path = ? WHERE run_id = ?", (digest_path, self.run_id)
+                )
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,88 @@
+"""
+Streaming helpers: run a producer generator in a background thread behind a bounded queue,
+so I/O-bound producers (Gmail download) overlap with CPU-bound consumers (extraction) while
+at most `maxsize` items are buffered in memory. merged_background() does the same for
+several producers at once (e.g. the date shards of a backfill).
+"""
+
+import queue
+import threading
+from itertools import islice
+from typing import Iterable, Iterator, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def background(iterable: Iterable[T], maxsize: int = 64, name: str = "producer") -> Iterator[T]:
+    """
+    Iterate `iterable` in a daemon thread, handing items over through a queue of at most
+    maxsize items. Exceptions in the producer are re-raised in the consumer. Closing the
+    returned generator early stops the producer at its next put.
+    """
+    return merged_background([iterable], maxsize, name)
+
+
+def merged_background(iterables: Iterable[Iterable[T]], maxsize: int = 64, name: str = "producer") -> Iterator[T]:
+    """
+    Like background() with one daemon thread per iterable, all feeding the same queue:
+    items arrive interleaved in whatever order the producers make them, and the stream
+    ends once every producer is done. The first producer exception is re-raised.
+    """
+    q: queue.Queue = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(iterable):
+        try:
+            for item in iterable:
+                if not _put(item):
+                    return
+        except BaseException as e:
+            _put(_Failure(e))
+            return
+        _put(_DONE)
+
+    iterables = list(iterables)
+    for i, iterable in enumerate(iterables):
+        thread_name = name if len(iterables) == 1 else f"{name}-{i}"
+        threading.Thread(target=_produce, args=(iterable,), name=thread_name, daemon=True).start()
+    return _consume(q, stop, len(iterables))
+
+
+def _consume(q: queue.Queue, stop: threading.Event, producers: int) -> Iterator:
+    try:
+        while producers:
+            item = q.get()
+            if item is _DONE:
+                producers -= 1
+                continue
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+    finally:
+        stop.set()
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[list[T]]:
+    """Yield lists of up to size items from iterable without materializing it."""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
@@ -0,0 +1,325 @@
+"""
+Record/replay of pipeline I/O for reproducible offline runs.
+
+    python -m src.run --record            # normal run; every Gmail call and HTTP fetch is archived
+    python -m src.run --replay            # same run from the archive: no Gmail, no network
+
+The archive (config.IO_ARCHIVE_PATH) is an append-only SQLite file: zlib-compressed JSON
+blobs keyed by their SHA-256 (identical responses are stored once) and a call log of
+(kind, request key, blob, latency) per recording. A recording also keeps the run date and
+a snapshot of the state store taken before the run, so a replay starts from the same
+checkpoints, sender verdicts and link history and makes the same decisions. Replays never
+write the real state store, article cache or redirect map. REPLAY_LATENCY_SCALE > 0
+sleeps for the recorded latency (times the scale) on each replayed call. Temporary files
+an archived run needs (temp_dir) are removed by stop().
+"""
+
+import base64
+import hashlib
+import json
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import defaultdict, deque
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import config
+from src import metrics
+
+RECORD = "record"
+REPLAY = "replay"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS calls (
+    seq INTEGER PRIMARY KEY,
+    recording TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    blob TEXT NOT NULL,
+    elapsed_ms REAL NOT NULL
+);
+"""
+
+
+class ReplayMiss(KeyError):
+    """The call being replayed is not in the recording."""
+
+
+class Archive:
+    """
+    One recording in an I/O archive. In record mode call() runs the live function and
+    appends its JSON result; in replay mode it returns the recorded result for the same
+    (kind, key), in recording order when a call was made more than once. Thread-safe.
+    """
+
+    def __init__(self, path: Path | str, mode: str, latency_scale: float = 0.0, recording: str = ""):
+        if mode not in (RECORD, REPLAY):
+            raise ValueError(f"Unknown I/O archive mode {mode!r}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        if mode == REPLAY and not self.path.exists():
+            raise FileNotFoundError(f"No I/O archive at {self.path}; record a run first (--record).")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self._entries: dict[tuple[str, str], deque] = defaultdict(deque)
+        if mode == RECORD:
+            now = time.time()
+            self.recording = time.strftime("%Y%m%dT%H%M%S", time.gmtime(now)) + f"-{int(now * 1000) % 1000:03d}"
+        else:
+            self.recording = recording or self._latest_recording()
+            rows = self.conn.execute(
+                "SELECT kind, key, blob, elapsed_ms FROM calls WHERE recording = ? ORDER BY seq",
+                (self.recording,),
+            )
+            for kind, key, blob, elapsed_ms in rows.fetchall():
+                self._entries[(kind, key)].append((blob, elapsed_ms))
+
+    def _latest_recording(self) -> str:
+        row = self.conn.execute("SELECT recording FROM calls ORDER BY seq DESC LIMIT 1").fetchone()
+        if not row:
+            raise FileNotFoundError(f"I/O archive {self.path} holds no recording.")
+        return row[0]
+
+    def call(self, kind: str, key: Any, live: Callable[[], Any]) -> Any:
+        """Result of live() (JSON-serializable), recorded or replayed. Replay raises ReplayMiss."""
+        if self.mode == REPLAY:
+            return self.lookup(kind, key)
+        start = time.perf_counter()
+        value = live()
+        self.append(kind, key, value, (time.perf_counter() - start) * 1000)
+        return value
+
+    def append(self, kind: str, key: Any, value: Any, elapsed_ms: float = 0.0) -> None:
+        raw = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256(raw).hexdigest()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO blobs (hash, data) VALUES (?, ?)", (digest, zlib.compress(raw, 6))
+            )
+            self.conn.execute(
+                "INSERT INTO calls (recording, kind, key, blob, elapsed_ms) VALUES (?, ?, ?, ?, ?)",
+                (self.recording, kind, _key(key), digest, elapsed_ms),
+            )
+        metrics.incr("replay.recorded")
+
+    def lookup(self, kind: str, key: Any) -> Any:
+        """Next recorded result for (kind, key); the last one repeats once all were served."""
+        with self._lock:
+            entries = self._entries.get((kind, _key(key)))
+            if not entries:
+                metrics.incr("replay.misses")
+                raise ReplayMiss((kind, key))
+            blob, elapsed_ms = entries[0] if len(entries) == 1 else entries.popleft()
+            row = self.conn.execute("SELECT data FROM blobs WHERE hash = ?", (blob,)).fetchone()
+        metrics.incr("replay.hits")
+        if self.latency_scale > 0:
+            time.sleep(elapsed_ms * self.latency_scale / 1000)
+        return json.loads(zlib.decompress(row[0]))
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def _key(key: Any) -> str:
+    return json.dumps(key, sort_keys=True, separators=(",", ":"))
+
+
+_current: Archive | None = None
+_temp_dirs: list[Path] = []
+
+
+def start(mode: str, path: Path | str | None = None, latency_scale: float | None = None) -> Archive | None:
+    """Open the archive for this process's run ("" mode: no archive). Returns it."""
+    global _current
+    stop()
+    if mode:
+        _current = Archive(
+            path or config.IO_ARCHIVE_PATH,
+            mode,
+            config.REPLAY_LATENCY_SCALE if latency_scale is None else latency_scale,
+        )
+    return _current
+
+
+def stop() -> None:
+    global _current
+    if _current is not None:
+        _current.close()
+        _current = None
+    while _temp_dirs:
+        shutil.rmtree(_temp_dirs.pop(), ignore_errors=True)
+
+
+def temp_dir(prefix: str) -> Path:
+    """A new temporary directory, deleted with its contents by the next stop()."""
+    path = Path(tempfile.mkdtemp(prefix=prefix))
+    _temp_dirs.append(path)
+    return path
+
+
+def current() -> Archive | None:
+    return _current
+
+
+def today() -> date:
+    """The run date: recorded with the run, and taken from the recording when replaying."""
+    if _current is None:
+        return date.today()
+    return date.fromisoformat(_current.call("meta.today", "", lambda: date.today().isoformat()))
+
+
+def state_path() -> Path | None:
+    """
+    State store path for this run: None (the configured one) unless an archive is open.
+    Recording snapshots the state store first; replaying restores that snapshot into a
+    temporary file, so the real state store is never touched.
+    """
+    if _current is None:
+        return None
+
+    def snapshot() -> str:
+        src = Path(config.STATE_DB_PATH)
+        if not src.exists():
+            return ""
+        with tempfile.TemporaryDirectory() as tmp:
+            copy = Path(tmp) / "state.sqlite3"
+            source, dest = sqlite3.connect(str(src)), sqlite3.connect(str(copy))
+            try:
+                source.backup(dest)
+            finally:
+                source.close()
+                dest.close()
+            return base64.b64encode(copy.read_bytes()).decode("ascii")
+
+    data = _current.call("meta.state", "", snapshot)
+    if _current.mode == RECORD:
+        return None
+    path = temp_dir("replay-state-") / "state.sqlite3"
+    if data:
+        path.write_bytes(base64.b64decode(data))
+    return path
+
+
+def http(method: str, url: str, headers: dict, live: Callable[[], Any], miss: Any = None) -> Any:
+    """
+    Result of an HTTP call (live() must return JSON-serializable data): live without an
+    archive, recorded or replayed with one. A replayed call that wasn't recorded returns miss.
+    """
+    if _current is None:
+        return live()
+    try:
+        return _current.call(f"http.{method}", [url, headers], live)
+    except ReplayMiss:
+        return miss
+
+
+class ArchivedGmailClient:
+    """
+    Stand-in for src.gmail.client.build_client(): with a live client it forwards every call
+    and records the responses, without one it serves them from the archive. Messages are
+    recorded one by one, so replays may fetch them in different chunks.
+    """
+
+    def __init__(self, archive: Archive, live=None):
+        from src.gmail.client import get_body_from_message, get_headers_from_message
+
+        self.archive = archive
+        self.live = live
+        self.get_body = get_body_from_message
+        self.get_headers = get_headers_from_message
+
+    def _call(self, method: str, key: Any, *args) -> Any:
+        return self.archive.call(f"gmail.{method}", key, lambda: getattr(self.live, method)(*args))
+
+    def _effect(self, method: str, key: Any, default: Any, *args) -> Any:
+        """Like _call for calls that change the mailbox; a replay that differs gets default."""
+        try:
+            return self._call(method, key, *args)
+        except ReplayMiss:
+            return default
+
+    def list_message_ids(self, q: str, max_results: int = 500) -> Iterator[str]:
+        return iter(self._call_list("list_message_ids", [q, max_results], q, max_results))
+
+    def list_history_message_ids(self, start: str) -> Iterator[str]:
+        from src.gmail.client import HistoryExpired
+
+        ids = self._call_list("list_history_message_ids", start, start)
+        if ids is None:
+            raise HistoryExpired(start)
+        return iter(ids)
+
+    def _call_list(self, method: str, key: Any, *args) -> list | None:
+        from src.gmail.client import HistoryExpired
+
+        def live() -> list | None:
+            try:
+                return list(getattr(self.live, method)(*args))
+            except HistoryExpired:
+                return None
+        return self.archive.call(f"gmail.{method}", key, live)
+
+    def get_history_id(self) -> str:
+        return self._call("get_history_id", "")
+
+    def get_message(self, mid: str) -> dict:
+        return self._call("get_message", mid, mid)
+
+    def get_messages(self, ids, format: str = "full") -> Iterator[dict]:
+        return self._messages(format, ids, lambda chunk: self.live.get_messages(chunk, format=format))
+
+    def get_message_metadata(self, ids) -> Iterator[dict]:
+        return self._messages("metadata", ids, self.live.get_message_metadata if self.live else None)
+
+    def _messages(self, format: str, ids, fetch) -> Iterator[dict]:
+        ids = list(ids)
+        if self.archive.mode == RECORD:
+            start = time.perf_counter()
+            for msg in fetch(ids):
+                now = time.perf_counter()
+                self.archive.append("gmail.message", [format, msg["id"]], msg, (now - start) * 1000)
+                start = now
+                yield msg
+            return
+        for mid in ids:
+            try:
+                yield self.archive.lookup("gmail.message", [format, mid])
+            except ReplayMiss:
+                continue
+
+    def mark_as_read(self, mid: str) -> None:
+        self._effect("mark_as_read", mid, None, mid)
+
+    def mark_many_as_read(self, ids) -> list[str]:
+        ids = list(ids)
+        return self._effect("mark_many_as_read", ids, [], ids)
+
+    def batch_modify(self, ids, add=None, remove=None) -> list[str]:
+        ids = list(ids)
+        return self._effect("batch_modify", [ids, add, remove], [], ids, add, remove)
+
+    def send_email(self, to: str, subj: str, body: str) -> dict:
+        # Key on recipient and subject only: the body changes with the code being profiled
+        return self._effect("send_email", [to, subj], {}, to, subj, body)
+
+
+def gmail_client(build: Callable[[], Any]):
+    """Gmail client for this run: build() without an archive, wrapped when recording, replayed otherwise."""
+    if _current is None:
+        return build()
+    if _current.mode == RECORD:
+        return ArchivedGmailClient(_current, build())
+    return ArchivedGmailClient(_current)
@@ -2,147 +2,534 @@
 Newsletter digest pipeline: fetch unread newsletters, extract content, dedupe, categorize, build HTML, send email.
 """
 
-from collections import defaultdict
-from datetime import date, timedelta
+import threading
+import time
+from typing import Any, Callable
+from collections import Counter, defaultdict
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from datetime import date
 from pathlib import Path
 
 import config
-from src.gmail.client import build_client
-from src.gmail.filters import is_likely_newsletter
-from src.extractors.newsletter import extract_body, extract_links
-from src.fetcher.article import fetch_and_extract
+from src import metrics, replay
+from src.gmail.client import DEFAULT_QUERY, HistoryExpired, build_client
+from src.gmail.filters import SenderVerdicts, is_newsletter
+from src.extractors.executor import ExtractionExecutor
+from src.fetcher.article import FetchPool
+from src.fetcher.canonical import Canonicalizer, canonical_url, default_canonicalizer
+from src.fetcher.session import reset_retry_budget
+from src.pipeline.backfill import Shard, message_day, plan_shards
 from src.pipeline.bootstrap import ensure_categories_file
 from src.pipeline.categories import load_categories, categorize_items
-from src.pipeline.dedup import merge_items
-from src.generator.digest import build_digest_html
+from src.pipeline.dedup import Deduper
+from src.pipeline.items import Item
+from src.pipeline.schedule import LinkScheduler, domain_of
+from src.pipeline.state import (
+    MSG_DIGESTED,
+    MSG_EXTRACTED,
+    MSG_LISTED,
+    MSG_MARKED_READ,
+    MSG_SKIPPED,
+    URL_FAILED,
+    URL_FETCHED,
+    StateStore,
+)
+from src.pipeline.stream import background, chunked, merged_background
+from src.generator.digest import write_digest
 
 
-def run(backfill_days: int | None = None, send: bool = True, mark_read: bool = True) -> str:
+def run(
+    backfill_days: int | None = None,
+    send: bool = True,
+    mark_read: bool = True,
+    resume: bool = False,
+    full_sync: bool = False,
+    io_mode: str | None = None,
+    per_day: bool = False,
+    client_factory: Callable[[], Any] | None = None,
+) -> str:
     """
     Run the full pipeline. Returns path to saved HTML file.
-    If backfill_days is set, use that instead of config.LOOKBACK_DAYS.
+    If backfill_days is set, use that instead of config.LOOKBACK_DAYS; windows longer than
+    config.BACKFILL_SHARD_DAYS are listed and downloaded as parallel date shards.
+    With per_day, one digest is written (and sent) per day messages were received instead
+    of one for the whole window; the first one's path is returned.
+    With config.GMAIL_INCREMENTAL_SYNC, only messages added since the last run that marked
+    messages read are listed (Gmail History API); backfill_days or full_sync list the whole window.
     If send is False, skip email. If mark_read is False, don't mark messages as read.
+    Progress is checkpointed in config.STATE_DB_PATH; with resume=True, continue the last
+    unfinished run, skipping messages/URLs already processed and never re-sending the digest.
+    A JSON run report (stage timings, counters, fetch latency) is written next to the digest.
+    io_mode (default config.IO_MODE) "record" archives every Gmail call and HTTP fetch in
+    config.IO_ARCHIVE_PATH; "replay" runs from the latest recording with no network and
+    writes its digest and report under output/replay/ (see src.replay).
+    client_factory builds the Gmail client (default build_client); bench.run passes a
+    synthetic inbox.
     """
+    metrics.reset()
+    reset_retry_budget()
+    if config.METRICS_HOOK:
+        metrics.load_hook(config.METRICS_HOOK)
+    io_mode = config.IO_MODE if io_mode is None else io_mode
+    replay.start(io_mode)
+    run_date = replay.today()
+    out_dir = config.OUTPUT_DIR / "replay" if io_mode == replay.REPLAY else config.OUTPUT_DIR
+    digest_path = ""
+    try:
+        digest_path = _run_pipeline(
+            backfill_days, send, mark_read, resume, full_sync, run_date, out_dir, per_day,
+            client_factory or build_client,
+        )
+        return digest_path
+    finally:
+        replay.stop()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        report_path = out_dir / f"newsletter-digest-{run_date.isoformat()}.json"
+        metrics.write_report(report_path, {
+            "digest_path": digest_path,
+            "backfill_days": backfill_days,
+            "send": send,
+            "mark_read": mark_read,
+            "resume": resume,
+            "full_sync": full_sync,
+            "io_mode": io_mode,
+            "per_day": per_day,
+        })
+        print(f"Wrote run report {report_path}")
+
+
+def _list_ids(client, query: str, history_id: str, unfinished: list[str] = ()):
+    """
+    Message ids to process: those added since history_id (incremental sync) after the
+    unfinished ones of the run that saved it, or the full query listing if there is no
+    history id or Gmail has expired it.
+    """
+    if history_id:
+        try:
+            # New mail only, so materializing is cheap; an expired id fails here, before any yield
+            ids = list(client.list_history_message_ids(history_id))
+            metrics.incr("gmail.incremental_syncs")
+            metrics.incr("gmail.unfinished_relisted", len(unfinished))
+            yield from dict.fromkeys([*unfinished, *ids])
+            return
+        except HistoryExpired:
+            print("Gmail history expired; falling back to a full sync.")
+            metrics.incr("gmail.history_expired")
+    yield from client.list_message_ids(query)
+
+
+def _gmail_events(
+    client,
+    query: str,
+    statuses: dict[str, str],
+    history_id: str = "",
+    verdicts: SenderVerdicts | None = None,
+    unfinished: list[str] = (),
+):
+    """
+    Producer stage of the streaming pipeline; runs in its own thread and is the only user
+    of the Gmail client while streaming. Lists ids page by page (or incrementally from
+    history_id, plus the unfinished ids of the last run), triages each chunk on metadata (headers and sender verdicts) and downloads
+    full payloads for candidates only. Yields ("listed", ids), ("rejected", ids) and
+    ("message", msg) events; ids already checkpointed are not fetched.
+    """
+    ids = metrics.timed_iter("gmail_list", _list_ids(client, query, history_id, unfinished))
+    for chunk in chunked(ids, config.GMAIL_CHUNK_SIZE):
+        yield "listed", chunk
+        pending = [mid for mid in chunk if statuses.get(mid, MSG_LISTED) == MSG_LISTED]
+        candidate_ids = []
+        rejected_ids = []
+        with metrics.stage("triage"):
+            for meta in client.get_message_metadata(pending):
+                headers = client.get_headers(meta)
+                if verdicts is not None and verdicts.blocked(headers.get("from", "")):
+                    metrics.incr("dropped.sender_blocked")
+                    rejected_ids.append(meta["id"])
+                elif is_newsletter(headers):
+                    candidate_ids.append(meta["id"])
+                else:
+                    rejected_ids.append(meta["id"])
+        yield "rejected", rejected_ids
+        for msg in metrics.timed_iter("download", client.get_messages(candidate_ids)):
+            yield "message", msg
+
+
+def _shard_events(
+    shards: list[Shard],
+    workers: int,
+    statuses: dict[str, str],
+    verdicts: SenderVerdicts | None = None,
+    client_factory: Callable[[], Any] = build_client,
+):
+    """
+    Producer stage of a sharded backfill: workers threads take shards in turn (newest
+    first) and run _gmail_events on each with a Gmail client of their own. Their events
+    are merged into one stream; Gmail quota is shared through src.gmail.client's limiter.
+    """
+    todo = iter(shards)
+    lock = threading.Lock()
+
+    def worker():
+        # Built in the worker thread: a Gmail service must not be shared across threads
+        client = replay.gmail_client(client_factory)
+        while True:
+            with lock:
+                shard = next(todo, None)
+            if shard is None:
+                return
+            metrics.incr("backfill.shards")
+            yield from _gmail_events(client, shard.query, statuses, "", verdicts)
+
+    return merged_background(
+        [worker() for _ in range(max(1, min(workers, len(shards))))],
+        maxsize=config.PIPELINE_BUFFER,
+        name="gmail",
+    )
+
+
+def _newsletter_record(
+    message_id: str,
+    from_h: str,
+    subject: str,
+    extracted: dict,
+    received: int = 0,
+    day: str = "",
+) -> dict | None:
+    """
+    Newsletter record (name, subject, snippet, links, received time and day) from an
+    extract_newsletter result, or None if the body is too short. The full body text is not kept.
+    """
+    body_text = extracted["body_text"]
+    if len(body_text.split()) < config.MIN_WORD_COUNT:
+        metrics.incr("dropped.too_short")
+        return None
+    return {
+        "message_id": message_id,
+        "newsletter_name": from_h.split("<")[0].strip() or from_h[:50],
+        "subject": subject,
+        "snippet": body_text[:500],
+        "links": extracted["links"],
+        "received": received,
+        "day": day,
+    }
+
+
+def _run_pipeline(
+    backfill_days: int | None,
+    send: bool,
+    mark_read: bool,
+    resume: bool,
+    full_sync: bool = False,
+    run_date: date | None = None,
+    out_dir: Path | None = None,
+    per_day: bool = False,
+    client_factory: Callable[[], Any] = build_client,
+) -> str:
+    """
+    Streaming pipeline: Gmail listing/triage/download runs in a producer thread behind a
+    bounded queue, extraction runs on the extraction executor's process pool as messages
+    arrive, and items feed the deduper incrementally.
+    Message bodies are dropped once snippet and links are taken, so memory stays flat.
+    Once every newsletter is extracted, links are ranked (src.pipeline.schedule) and the
+    best MAX_LINKS_PER_RUN are fetched in that order within FETCH_TIME_BUDGET_S.
+    A sharded backfill runs several producers (_shard_events); its newsletters are added
+    newest first once all are extracted, so the digest doesn't depend on shard timing.
+    """
+    started = time.perf_counter()
+    run_date = run_date or date.today()
+    out_dir = out_dir or config.OUTPUT_DIR
     ensure_categories_file()
-    config.OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+    out_dir.mkdir(parents=True, exist_ok=True)
 
     lookback = backfill_days if backfill_days is not None else config.LOOKBACK_DAYS
-    query = f"in:inbox is:unread newer_than:{lookback}d"
+    query = f"{DEFAULT_QUERY} newer_than:{lookback}d"
+    shards: list[Shard] = []
+    if backfill_days is not None and 0 < config.BACKFILL_SHARD_DAYS < backfill_days:
+        shards = plan_shards(run_date, backfill_days, config.BACKFILL_SHARD_DAYS)
+        print(f"Backfilling {backfill_days} days in {len(shards)} shards")
 
-    client = build_client()
-    message_ids = list(client.list_message_ids(query))
-    if not message_ids:
-        print("No unread messages in lookback window.")
-        return ""
+    # Recorded and replayed runs start from the state snapshot in the archive
+    state = StateStore(replay.state_path())
+    run_id = state.begin_run(resume=resume)
+    if state.resumed:
+        print(f"Resuming run {run_id}")
+    elif resume:
+        print(f"No unfinished run to resume; starting run {run_id}")
 
-    newsletters = []
-    all_links: list[dict] = []
-    link_to_newsletters: dict[str, list[str]] = defaultdict(list)
+    with metrics.stage("gmail_connect"):
+        client = replay.gmail_client(client_factory)
+        # Taken before listing so mail arriving during the run is picked up next time
+        next_history_id = client.get_history_id() if config.GMAIL_INCREMENTAL_SYNC else ""
+    history_id = ""
+    unfinished: list[str] = []
+    if config.GMAIL_INCREMENTAL_SYNC and backfill_days is None and not full_sync:
+        history_id = state.history_id()
+        # Messages the last run listed but failed to download or mark read
+        unfinished = state.unfinished_ids()
+    # Advance the sync point only when messages are consumed (marked read); otherwise a
+    # dry run would hide them from the next real run
+    if not mark_read:
+        next_history_id = ""
+    # Checkpoints of a resumed run (empty for a fresh run)
+    statuses = state.message_statuses()
+    fetched = state.url_results()
+    verdicts = SenderVerdicts(state.sender_stats())
 
-    for mid in message_ids:
-        msg = client.get_message(mid)
-        headers = client.get_headers(msg)
-        from_h = headers.get("from", "")
-        subject = headers.get("subject", "")
-        if not is_likely_newsletter(from_h, subject):
-            continue
-        body_html = client.get_body(msg)
-        if not body_html.strip():
-            continue
-        body_text = extract_body(body_html)
-        if len(body_text.split()) < config.MIN_WORD_COUNT:
-            continue
-        links = extract_links(body_html)
-        newsletter_name = from_h.split("<")[0].strip() or from_h[:50]
-        newsletters.append({
-            "message_id": mid,
-            "newsletter_name": newsletter_name,
-            "subject": subject,
-            "body_text": body_text,
-            "links": links,
-        })
-        for lnk in links:
-            url = lnk.get("url", "")
-            if url:
-                link_to_newsletters[url].append(newsletter_name)
-
-    # Build items from newsletter bodies (one item per newsletter)
-    items = []
-    for n in newsletters:
-        items.append({
-            "title": n["subject"],
-            "url": "",
-            "snippet": n["body_text"][:500],
-            "newsletter_name": n["newsletter_name"],
-            "newsletter_names": [n["newsletter_name"]],
-            "message_id": n["message_id"],
-        })
+    def record_sender(from_h: str, accepted: bool) -> None:
+        sender = verdicts.record(from_h, accepted)
+        if sender:
+            state.set_sender(sender, verdicts.stats[sender])
+
+    deduper = Deduper()
+    link_to_newsletters: dict[str, list[str]] = defaultdict(list)
+    if replay.current() is not None:
+        # A throwaway redirect map, so every resolution goes through the archive
+        canonicalizer = Canonicalizer(replay.temp_dir("replay-urls-") / "url-map.sqlite3")
+    else:
+        canonicalizer = default_canonicalizer()
+    # Trackers are ranked by the article they lead to, where the redirect map knows it
+    scheduler = LinkScheduler(state.domain_stats(), state.digested_urls(), canonicalizer.lookup)
+    # Links that made it into this digest (as listed and as fetched), remembered for later runs
+    digest_urls: set[str] = set()
+    newsletter_ids: list[str] = []
+    newsletters_per_day: Counter = Counter()
+    # Earliest day each link was cited on
+    link_day: dict[str, str] = {}
+    # Records of a sharded backfill, held until every shard is done
+    held: list[dict] = []
+    total_messages = 0
 
-    # Collect unique links and fetch (up to MAX_LINKS_PER_RUN)
-    seen_url = set()
-    to_fetch = []
-    for n in newsletters:
+    def add_newsletter(n: dict) -> None:
+        newsletter_ids.append(n["message_id"])
+        # Records checkpointed before per-day digests have no day: they count as the run date
+        day = n.get("day") or run_date.isoformat()
+        newsletters_per_day[day] += 1
+        # One item per newsletter body
+        deduper.add(Item(
+            title=n["subject"],
+            snippet=n["snippet"],
+            newsletter_names=[n["newsletter_name"]],
+            message_ids=[n["message_id"]],
+            day=day,
+        ))
+        # Links are only collected here; they are ranked and fetched once all are known
         for lnk in n["links"]:
-            u = lnk.get("url", "").strip()
-            if not u or u in seen_url:
+            # Links are canonical from extraction; records checkpointed before that may not be
+            u = canonical_url(lnk.get("url", ""))
+            if u:
+                link_to_newsletters[u].append(n["newsletter_name"])
+                link_day[u] = min(link_day.get(u, day), day)
+                scheduler.add(u, n["newsletter_name"], lnk.get("text", ""))
+
+    def fetch_links(pool: FetchPool) -> int:
+        """
+        Fetch the best-ranked links (checkpointed results first) and add them to the deduper
+        in rank order. Fetches not done when the time budget runs out are cancelled.
+        Returns the number of links scheduled.
+        """
+        to_fetch = scheduler.select(config.MAX_LINKS_PER_RUN, prefer=fetched)
+        state.add_urls(to_fetch)
+        pending = []
+        for u in to_fetch:
+            if u in fetched:
+                metrics.incr("urls.checkpoint_hits")
+                pending.append((u, fetched[u]))
+            else:
+                pending.append((u, pool.submit(u)))
+        deadline = time.monotonic() + config.FETCH_TIME_BUDGET_S if config.FETCH_TIME_BUDGET_S > 0 else None
+        for i, (url, result) in enumerate(pending):
+            if isinstance(result, Future):
+                try:
+                    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                    result = result.result(timeout=timeout)
+                except FutureTimeout:
+                    dropped = [f for _, f in pending[i:] if isinstance(f, Future)]
+                    # Queued fetches are dropped, running ones stop at their next wait or
+                    # retry, and the pool exits without waiting for them
+                    pool.cancel()
+                    metrics.incr("urls.time_budget_dropped", len(dropped))
+                    print(f"Fetch time budget exhausted; dropped {len(dropped)} links.")
+                    break
+                # Keep only what the digest uses; the full article text is not checkpointed
+                result = {k: result.get(k) for k in ("url", "title", "snippet", "error")}
+                state.set_url(url, URL_FAILED if result["error"] else URL_FETCHED, result)
+                state.record_fetch(domain_of(result.get("url") or url), not result["error"])
+            if result.get("error"):
                 continue
-            seen_url.add(u)
-            to_fetch.append((u, lnk.get("text") or ""))
-            if len(to_fetch) >= config.MAX_LINKS_PER_RUN:
-                break
-        if len(to_fetch) >= config.MAX_LINKS_PER_RUN:
-            break
-
-    for url, _ in to_fetch:
-        result = fetch_and_extract(url)
-        if result.get("error"):
-            continue
-        names = link_to_newsletters.get(url, [])
-        items.append({
-            "title": result.get("title") or url,
-            "url": url,
-            "snippet": result.get("snippet", ""),
-            "newsletter_name": names[0] if names else "Unknown",
-            "newsletter_names": names,
-        })
+            digest_urls.update(u for u in (url, result.get("url")) if u)
+            names = link_to_newsletters[url]
+            # Links that resolve to the same article share its canonical url; the deduper merges them
+            deduper.add(Item(
+                title=result.get("title") or url,
+                url=result.get("url") or url,
+                snippet=result.get("snippet") or "",
+                newsletter_names=names,
+                day=link_day.get(url, ""),
+            ))
+        return len(to_fetch)
+
+    def add_extracted(extractor: ExtractionExecutor, block: bool) -> None:
+        for (mid, from_h, subject, received), extracted in extractor.completed(block=block):
+            day = message_day(received, run_date).isoformat()
+            record = _newsletter_record(mid, from_h, subject, extracted, received, day)
+            record_sender(from_h, record is not None)
+            if record is None:
+                state.set_message(mid, MSG_SKIPPED)
+            else:
+                state.set_message(mid, MSG_EXTRACTED, record)
+                if shards:
+                    held.append(record)
+                else:
+                    add_newsletter(record)
 
-    if not items:
+    # Archived runs bypass the article cache so every fetch goes through the archive
+    pool_options = {"use_cache": replay.current() is None, "canonicalizer": canonicalizer}
+
+    with ExtractionExecutor() as extractor, FetchPool(extractor=extractor, **pool_options) as pool:
+        # Every extracted newsletter checkpointed before a resume
+        for n in state.newsletters():
+            add_newsletter(n)
+
+        if shards:
+            events = _shard_events(shards, config.BACKFILL_WORKERS, statuses, verdicts, client_factory)
+        else:
+            events = background(
+                _gmail_events(client, query, statuses, history_id, verdicts, unfinished),
+                maxsize=config.PIPELINE_BUFFER,
+                name="gmail",
+            )
+        for kind, payload in events:
+            if kind == "listed":
+                if not total_messages:
+                    # Startup cost: auth, service build and the first listing page
+                    metrics.incr("startup.first_list_s", time.perf_counter() - started)
+                total_messages += len(payload)
+                state.add_messages(payload)
+                metrics.incr("messages.listed", len(payload))
+                metrics.incr("messages.checkpointed", sum(1 for mid in payload if statuses.get(mid, MSG_LISTED) != MSG_LISTED))
+            elif kind == "rejected":
+                state.set_messages(payload, MSG_SKIPPED)
+                metrics.incr("dropped.not_newsletter", len(payload))
+            else:
+                headers = client.get_headers(payload)
+                body_html = client.get_body(payload)
+                if not body_html.strip():
+                    metrics.incr("dropped.empty_body")
+                    state.set_message(payload["id"], MSG_SKIPPED)
+                    record_sender(headers.get("from", ""), False)
+                else:
+                    key = (
+                        payload["id"],
+                        headers.get("from", ""),
+                        headers.get("subject", ""),
+                        int(payload.get("internalDate") or 0),
+                    )
+                    extractor.submit_newsletter(key, body_html)
+            add_extracted(extractor, block=False)
+
+        add_extracted(extractor, block=True)
+        for record in sorted(held, key=lambda n: (-n["received"], n["message_id"])):
+            add_newsletter(record)
+        metrics.incr("urls.candidates", len(scheduler))
+        with metrics.stage("fetch"):
+            metrics.incr("urls.to_fetch", fetch_links(pool))
+
+    if not newsletter_ids and not total_messages:
+        print("No unread messages in lookback window.")
+        state.finish_run(next_history_id, state.unconsumed_messages())
+        return ""
+
+    if not len(deduper):
         print("No content to digest.")
+        state.finish_run(next_history_id, state.unconsumed_messages())
         return ""
 
-    merged = merge_items(items)
-    categories = load_categories()
-    categorized = categorize_items(merged, categories)
+    with metrics.stage("dedup"):
+        merged = deduper.merged()
+    with metrics.stage("categorize"):
+        categories = load_categories()
+        categorized = categorize_items(merged, categories)
+    metrics.incr("items.total", len(deduper))
+    metrics.incr("items.merged", len(merged))
 
-    by_category = defaultdict(list)
-    for it in categorized:
-        by_category[it["category"]].append(it)
+    if per_day:
+        by_day = defaultdict(list)
+        for it in categorized:
+            by_day[it.day or run_date.isoformat()].append(it)
+        digests = [(date.fromisoformat(day), by_day[day]) for day in sorted(by_day)]
+        # Per-day digests of a run go in a folder of their own, not over earlier daily digests
+        digest_dir = out_dir / f"newsletter-digest-{run_date.isoformat()}-days"
+        digest_dir.mkdir(parents=True, exist_ok=True)
+    else:
+        digests = [(run_date, categorized)]
+        digest_dir = out_dir
 
-    digest_date = date.today()
-    html = build_digest_html(
-        dict(by_category),
-        digest_date=digest_date,
-        total_newsletters=len(newsletters),
-        total_messages=len(message_ids),
+    written: list[tuple[date, list[Path]]] = []
+    with metrics.stage("render"):
+        for digest_date, items in digests:
+            by_category = defaultdict(list)
+            for it in items:
+                by_category[it.category].append(it)
+            paths = write_digest(
+                digest_dir / f"newsletter-digest-{digest_date.isoformat()}.html",
+                dict(by_category),
+                digest_date=digest_date,
+                total_newsletters=newsletters_per_day[digest_date.isoformat()] if per_day else len(newsletter_ids),
+                # Listed messages aren't dated, so a day's digest leaves that count out
+                total_messages=None if per_day else total_messages,
+                max_bytes=config.DIGEST_MAX_BYTES or None,
+                inline_styles=config.DIGEST_INLINE_STYLES,
+            )
+            written.append((digest_date, paths))
+    all_paths = [p for _, paths in written for p in paths]
+    out_path = all_paths[0]
+    metrics.incr("digest.bytes", sum(p.stat().st_size for p in all_paths))
+    metrics.incr("digest.parts", len(all_paths))
+    metrics.incr("digest.days", len(written))
+    for p in all_paths:
+        print(f"Wrote {p}")
+    statuses = state.message_statuses()
+    state.set_messages(
+        [mid for mid in newsletter_ids if statuses.get(mid) == MSG_EXTRACTED],
+        MSG_DIGESTED,
     )
-
-    out_path = config.OUTPUT_DIR / f"newsletter-digest-{digest_date.isoformat()}.html"
-    out_path.write_text(html, encoding="utf-8")
-    print(f"Wrote {out_path}")
+    state.set_digest(str(out_path))
+    # Like the sync point, only a run that consumes its messages marks links as covered
+    if mark_read:
+        state.add_digested_urls(digest_urls)
 
     if send and config.DIGEST_RECIPIENT:
-        client.send_email(
-            config.DIGEST_RECIPIENT,
-            f"Newsletter Digest — {digest_date.isoformat()}",
-            html,
-        )
-        print(f"Sent digest to {config.DIGEST_RECIPIENT}")
+        if state.digest_sent():
+            print("Digest already sent for this run; not sending again.")
+        else:
+            # Each day or part is checkpointed as it goes out, so a resume sends only the rest
+            sent_parts = state.sent_parts()
+            with metrics.stage("send"):
+                for digest_date, paths in written:
+                    for n, p in enumerate(paths, start=1):
+                        if str(p) in sent_parts:
+                            metrics.incr("digest.parts_already_sent")
+                            continue
+                        subject = f"Newsletter Digest — {digest_date.isoformat()}"
+                        if len(paths) > 1:
+                            subject += f" ({n}/{len(paths)})"
+                        client.send_email(config.DIGEST_RECIPIENT, subject, p.read_text(encoding="utf-8"))
+                        state.set_part_sent(str(p))
+            state.set_digest(str(out_path), sent=True)
+            print(f"Sent digest to {config.DIGEST_RECIPIENT}")
 
     if mark_read:
-        for n in newsletters:
-            client.mark_as_read(n["message_id"])
-        print("Marked newsletters as read.")
+        to_mark = [mid for mid in newsletter_ids if statuses.get(mid) != MSG_MARKED_READ]
+        with metrics.stage("mark_read"):
+            failed = client.mark_many_as_read(to_mark)
+        failed_set = set(failed)
+        state.set_messages([mid for mid in to_mark if mid not in failed_set], MSG_MARKED_READ)
+        if failed:
+            print(f"Marked newsletters as read ({len(failed)} could not be updated).")
+        else:
+            print("Marked newsletters as read.")
 
+    state.finish_run(next_history_id, state.unconsumed_messages())
     return str(out_path)
 
 
@@ -152,5 +539,19 @@ if __name__ == "__main__":
     p.add_argument("--backfill", type=int, default=None, help="Use N days lookback instead of config")
     p.add_argument("--no-send", action="store_true", help="Do not send email")
     p.add_argument("--no-mark-read", action="store_true", help="Do not mark messages as read")
+    p.add_argument("--resume", action="store_true", help="Continue the last unfinished run from its checkpoint")
+    p.add_argument("--full-sync", action="store_true", help="List the whole lookback window instead of new mail only")
+    p.add_argument("--per-day", action="store_true", help="Write and send one digest per day instead of one for the window")
+    io = p.add_mutually_exclusive_group()
+    io.add_argument("--record", action="store_const", const=replay.RECORD, dest="io_mode", help="Archive all Gmail and HTTP I/O for replay")
+    io.add_argument("--replay", action="store_const", const=replay.REPLAY, dest="io_mode", help="Run offline from the last recorded archive")
     args = p.parse_args()
-    run(backfill_days=args.backfill, send=not args.no_send, mark_read=not args.no_mark_read)
+    run(
+        backfill_days=args.backfill,
+        send=not args.no_send,
+        mark_read=not args.no_mark_read,
+        resume=args.resume,
+        full_sync=args.full_sync,
+        io_mode=args.io_mode,
+        per_day=args.per_day,
+    )
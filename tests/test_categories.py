@@ -0,0 +1,53 @@
+"""Categorization regressions: an item's category must not depend on the rest of its batch."""
+
+import random
+
+import pytest
+
+from src.pipeline.categories import TfidfCategorizer
+from src.pipeline.items import Item
+
+pytest.importorskip("numpy")
+
+# Stories are mostly words no category uses, with one category term each, like real snippets
+FILLER = [f"w{k}" for k in range(3000)]
+AI = ["ai", "models", "software", "platforms", "tools", "hardware", "products"]
+ELECTIONS = ["elections", "government", "legislation", "regulation", "diplomacy"]
+MARKETS = ["markets", "investing", "startups", "economics"]
+CATEGORIES = [
+    {"name": "Technology & AI", "definition": "Products, models, tools, platforms, software, hardware."},
+    {"name": "Business & Finance", "definition": "Markets, investing, startups, corporate strategy, economics."},
+    {"name": "Politics & Policy", "definition": "Government, regulation, elections, legislation, diplomacy."},
+    {"name": "Other", "definition": "Items that do not fit the other categories."},
+]
+
+
+def _stories(rng: random.Random, terms: list[str], n: int) -> list[Item]:
+    items = []
+    for _ in range(n):
+        words = [rng.choice(FILLER) for _ in range(80)] + [rng.choice(terms)]
+        rng.shuffle(words)
+        items.append(Item(title=" ".join(words[:8]), snippet=" ".join(words[8:])))
+    return items
+
+
+@pytest.fixture(scope="module")
+def categorizer() -> TfidfCategorizer:
+    return TfidfCategorizer(CATEGORIES)
+
+
+def test_category_does_not_depend_on_batch(categorizer):
+    rng = random.Random(1)
+    ai = _stories(rng, AI, 60)
+    batch = ai + _stories(rng, ELECTIONS, 10) + _stories(rng, MARKETS, 10)
+    alone = [categorizer.assign_all([it])[0] for it in batch]
+    assert alone[:60] == ["Technology & AI"] * 60
+    assert categorizer.assign_all(batch) == alone
+
+
+def test_item_among_same_topic_items(categorizer):
+    rng = random.Random(2)
+    item, *others = _stories(rng, AI, 301)
+    alone = categorizer.assign_all([item])[0]
+    assert alone == "Technology & AI"
+    assert categorizer.assign_all([item] + others)[0] == alone
@@ -0,0 +1,44 @@
+"""Incremental sync must not lose messages a run listed but did not consume."""
+
+from src.pipeline.state import MSG_EXTRACTED, MSG_MARKED_READ, MSG_SKIPPED, StateStore
+from src.run import _list_ids
+
+
+class HistoryClient:
+    def __init__(self, added: list[str]):
+        self.added = added
+
+    def list_history_message_ids(self, start_history_id: str):
+        yield from self.added
+
+    def list_message_ids(self, query: str):
+        raise AssertionError("full listing during an incremental sync")
+
+
+def test_unconsumed_messages_are_listed_again(tmp_path):
+    state = StateStore(tmp_path / "state.sqlite3")
+    state.begin_run()
+    state.add_messages(["read", "skipped", "download-failed", "mark-failed"])
+    state.set_message("read", MSG_MARKED_READ)
+    state.set_message("skipped", MSG_SKIPPED)
+    state.set_message("mark-failed", MSG_EXTRACTED)
+    state.finish_run("42", state.unconsumed_messages())
+
+    state.begin_run()
+    assert state.history_id() == "42"
+    unfinished = state.unfinished_ids()
+    assert unfinished == ["download-failed", "mark-failed"]
+    ids = list(_list_ids(HistoryClient(["new", "mark-failed"]), "", "42", unfinished))
+    assert ids == ["download-failed", "mark-failed", "new"]
+
+
+def test_run_that_keeps_the_sync_point_keeps_its_unfinished_ids(tmp_path):
+    state = StateStore(tmp_path / "state.sqlite3")
+    state.begin_run()
+    state.add_messages(["a"])
+    state.finish_run("7", state.unconsumed_messages())
+    # A dry run does not advance the sync point, so nothing it left over is dropped
+    state.begin_run()
+    state.finish_run("", [])
+    assert state.history_id() == "7"
+    assert state.unfinished_ids() == ["a"]
@@ -0,0 +1,22 @@
+"""Link extraction: one malformed href must not abort a newsletter, let alone the run."""
+
+from src.extractors.newsletter import extract_links
+from src.fetcher.canonical import canonical_url
+
+HTML = """
+<p>Good read: <a href="https://news.example.com/story?utm_source=nl">the story</a></p>
+<p>Broken port: <a href="http://example.com:abc/story">bad</a></p>
+<p>Broken host: <a href="http://[abc/story">bad</a></p>
+<p>IPv6: <a href="http://[2001:db8::1]:8080/post">v6 post</a></p>
+"""
+
+
+def test_malformed_hrefs_are_dropped():
+    urls = [lnk["url"] for lnk in extract_links(HTML)]
+    assert urls == ["https://news.example.com/story", "http://[2001:db8::1]:8080/post"]
+
+
+def test_canonical_url_of_malformed_url_is_empty():
+    assert canonical_url("http://example.com:abc/story") == ""
+    assert canonical_url("http://[abc/story") == ""
+    assert canonical_url("https://example.com/r?url=http://[abc/x") == ""
@@ -0,0 +1,20 @@
+"""Resuming a run must not email a digest day or part twice."""
+
+from src.pipeline.state import StateStore
+
+
+def test_sent_parts_survive_resume_only(tmp_path):
+    state = StateStore(tmp_path / "state.sqlite3")
+    state.begin_run()
+    state.set_part_sent("out/day-1.html")
+    state.set_part_sent("out/day-2.html")
+
+    state.begin_run(resume=True)
+    assert state.resumed
+    assert state.sent_parts() == {"out/day-1.html", "out/day-2.html"}
+    assert not state.digest_sent()
+
+    state.finish_run()
+    state.begin_run(resume=True)
+    assert not state.resumed
+    assert state.sent_parts() == set()